@@ -0,0 +1,74 @@
+"""Micro-benchmark for the PCA301 frame splitter and report decoder.
+
+Feeds recorded stick traffic through ``protocol.FrameSplitter`` and
+``protocol.decode_report`` and prints the number of frames per second.
+
+    python benchmarks/bench_decoder.py [traffic file] [--chunk 64] [--rounds 20]
+"""
+
+import argparse
+import importlib.util
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_TRAFFIC = Path(__file__).resolve().parent / "pca301_traffic.txt"
+
+
+def load_protocol():
+    """Import protocol.py without importing the Home Assistant integration."""
+    path = ROOT / "custom_components" / "pca301" / "protocol.py"
+    spec = importlib.util.spec_from_file_location("pca301_protocol", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def bench(label, func, frames, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<24} {frames / best:>12,.0f} frames/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("traffic", nargs="?", type=Path, default=DEFAULT_TRAFFIC)
+    parser.add_argument("--chunk", type=int, default=64, help="bytes per read")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    protocol = load_protocol()
+    data = args.traffic.read_bytes()
+    chunks = [data[i : i + args.chunk] for i in range(0, len(data), args.chunk)]
+    lines = protocol.FrameSplitter().feed(data)
+    decode = protocol.decode_report
+    frames = len(lines)
+    reports = sum(decode(line) is not None for line in lines)
+    print(f"{args.traffic.name}: {len(data)} bytes, {frames} lines, {reports} reports")
+
+    def split_only():
+        framer = protocol.FrameSplitter()
+        for chunk in chunks:
+            framer.feed(chunk)
+
+    def decode_only():
+        for line in lines:
+            decode(line)
+
+    def pipeline():
+        framer = protocol.FrameSplitter()
+        for chunk in chunks:
+            for line in framer.feed(chunk):
+                decode(line)
+
+    bench("split", split_only, frames, args.rounds)
+    bench("decode", decode_only, frames, args.rounds)
+    bench("split + decode", pipeline, frames, args.rounds)
+
+
+if __name__ == "__main__":
+    main()
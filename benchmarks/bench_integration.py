@@ -0,0 +1,267 @@
+"""End-to-end benchmark of the PCA301 integration against the stick emulator.
+
+Runs ``pypca.PCA`` inside a Home Assistant instance, connected to
+``emulator.StickEmulator`` on a pseudo-terminal, with the power,
+consumption and switch entities of every plug added through an entity
+platform, for several fleet sizes and measures:
+
+- latency from a frame being written by the stick to its values being
+  stored in the device state table, and to the entity states being
+  written through the coordinator (percentiles),
+- sustained frames/second before falling behind the offered rate,
+- round-trip time of turn_on/turn_off commands,
+- event loop CPU time per frame,
+- memory per device.
+
+Needs Home Assistant installed. Results are written as JSON:
+
+    python benchmarks/bench_integration.py --plugs 1 10 100 500 --output results.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from emulator import StickEmulator  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers import device_registry as dr, entity_registry as er  # noqa: E402
+from homeassistant.helpers.entity_platform import EntityPlatform  # noqa: E402
+
+from custom_components.pca301.coordinator import PCACoordinator  # noqa: E402
+from custom_components.pca301.protocol import decode_report, format_device_id  # noqa: E402
+from custom_components.pca301.pypca import PCA  # noqa: E402
+from custom_components.pca301.sensor import ConsumptionSensor, PowerSensor  # noqa: E402
+from custom_components.pca301.switch import SmartPlugSwitch  # noqa: E402
+
+OFFERED_RATES = (50, 100, 200, 500, 1000, 2000, 5000)  # frames/s over all plugs
+# Fraction of the offered frames that may be missing per step. A pty blocks
+# the stick instead of dropping, so falling behind shows up as frames never
+# emitted; the emulator's Poisson spread is allowed on top (3 sigma).
+MAX_DROP = 0.001
+INTEGRATION_FILES = tracemalloc.Filter(True, str(ROOT / "custom_components" / "*"))
+
+
+def percentiles(values):
+    """Return p50/p95/p99/max of a list of seconds in milliseconds."""
+    if not values:
+        return None
+    values = sorted(values)
+
+    def pick(fraction):
+        return values[min(len(values) - 1, int(fraction * len(values)))] * 1000
+
+    return {
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": values[-1] * 1000,
+        "count": len(values),
+    }
+
+
+class FrameTimer:
+    """Match frames handled by PCA with the time the emulator wrote them."""
+
+    def __init__(self, pca):
+        self.sent = {}  # frame: list of write times (appended by the emulator thread)
+        self.latencies = []
+        self.write_latencies = []
+        self.handled = 0
+        self.unwritten = {}  # deviceId: write times of frames waiting for the flush
+        handle_line = pca._handle_line
+
+        def timed_handle_line(line):
+            handle_line(line)
+            now = time.perf_counter()
+            times = self.sent.get(line)
+            if times:
+                sent = times.pop(0)
+                self.latencies.append(now - sent)
+                self.handled += 1
+                report = decode_report(line)
+                deviceId = format_device_id(report.device)
+                # Frames without new values are not written at all
+                if deviceId in pca._pending_updates:
+                    self.unwritten.setdefault(deviceId, []).append(sent)
+
+        devices_updated = pca.coordinator.async_devices_updated
+
+        def timed_devices_updated(device_ids):
+            devices_updated(device_ids)
+            now = time.perf_counter()
+            for deviceId in device_ids:
+                for sent in self.unwritten.pop(deviceId, ()):
+                    self.write_latencies.append(now - sent)
+
+        pca._handle_line = timed_handle_line
+        pca.coordinator.async_devices_updated = timed_devices_updated
+
+    def report_hook(self, when, frame):
+        self.sent.setdefault(frame, []).append(when)
+
+    def reset(self):
+        self.sent.clear()
+        self.latencies = []
+        self.write_latencies = []
+        self.handled = 0
+        self.unwritten.clear()
+
+
+async def add_entities(hass, pca):
+    """Add the entities of all plugs like the integration's platforms do."""
+    platforms = []
+    for domain, entity_classes in (
+        ("sensor", (PowerSensor, ConsumptionSensor)),
+        ("switch", (SmartPlugSwitch,)),
+    ):
+        platform = EntityPlatform(
+            hass=hass,
+            logger=logging.getLogger(__name__),
+            domain=domain,
+            platform_name="pca301",
+            platform=None,
+            scan_interval=timedelta(seconds=30),
+            entity_namespace=None,
+        )
+        await platform.async_add_entities(
+            [
+                entity_class(hass, pca, deviceId)
+                for deviceId in pca.known_devices
+                for entity_class in entity_classes
+            ]
+        )
+        platforms.append(platform)
+    return platforms
+
+
+async def measure(hass, plugs, duration):
+    emulator = StickEmulator(plugs=plugs, seed=plugs)
+    port = emulator.start()
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    pca = PCA(hass, port, status_polling=False)
+    PCACoordinator(hass, pca)
+    pca.known_devices = {plug.device_id: str(plug.channel) for plug in emulator.plugs.values()}
+    timer = FrameTimer(pca)
+    emulator.report_hook = timer.report_hook
+    await pca.async_open()
+    platforms = await add_entities(hass, pca)
+    result = {"plugs": plugs}
+    try:
+        # Latency and CPU at a moderate load: every plug reports once per second
+        emulator.set_report_rate(1.0 if plugs <= 200 else 200.0 / plugs)
+        await asyncio.sleep(0.5)
+        timer.reset()
+        cpu = time.thread_time()
+        await asyncio.sleep(duration)
+        cpu = time.thread_time() - cpu
+        result["latency_ms"] = percentiles(timer.latencies)
+        result["state_written_latency_ms"] = percentiles(timer.write_latencies)
+        result["cpu_us_per_frame"] = cpu / timer.handled * 1e6 if timer.handled else None
+
+        # Only count allocations made by the integration, not by the emulator
+        snapshot = tracemalloc.take_snapshot().filter_traces([INTEGRATION_FILES])
+        baseline = baseline.filter_traces([INTEGRATION_FILES])
+        result["memory_bytes_per_device"] = (
+            sum(stat.size_diff for stat in snapshot.compare_to(baseline, "filename"))
+            / plugs
+        )
+        tracemalloc.stop()
+
+        # Throughput: raise the offered rate until the offered frames are not
+        # all handled any more (the stick emitting less counts as well)
+        sustained = None
+        steps = []
+        for offered in OFFERED_RATES:
+            emulator.set_report_rate(offered / plugs)
+            await asyncio.sleep(0.2)
+            timer.reset()
+            emitted = emulator.stats["reports"]
+            await asyncio.sleep(duration)
+            emitted = emulator.stats["reports"] - emitted
+            handled = timer.handled
+            expected = offered * duration
+            drop = 1 - handled / expected
+            steps.append(
+                {
+                    "offered": offered,
+                    "emitted": emitted,
+                    "emit_shortfall": 1 - emitted / expected,
+                    "handled_per_second": handled / duration,
+                    "drop": drop,
+                }
+            )
+            if drop > MAX_DROP + 3 / math.sqrt(expected):
+                break
+            sustained = handled / duration
+        result["frames_per_second"] = sustained
+        result["throughput_steps"] = steps
+        emulator.set_report_rate(0.0)
+        await asyncio.sleep(0.2)
+
+        # Command round trips, one plug after the other
+        rtts = []
+        for plug in list(emulator.plugs.values())[:20]:
+            for value in (0, 1):
+                start = time.perf_counter()
+                await pca.async_switch(plug.device_id, value)
+                rtts.append(time.perf_counter() - start)
+        result["command_rtt_ms"] = percentiles(rtts)
+    finally:
+        for platform in platforms:
+            await platform.async_reset()
+        pca.close()
+        await asyncio.sleep(0.1)
+        emulator.close()
+    return result
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plugs", type=int, nargs="+", default=[1, 10, 100, 500])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per step")
+    parser.add_argument("--output", type=Path, default=Path("bench_integration.json"))
+    args = parser.parse_args()
+
+    manifest = json.loads((ROOT / "custom_components" / "pca301" / "manifest.json").read_text())
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        await dr.async_load(hass)
+        await er.async_load(hass)
+        results = []
+        for plugs in args.plugs:
+            print(f"Running with {plugs} plugs...")
+            result = await measure(hass, plugs, args.duration)
+            print(json.dumps(result, indent=2))
+            results.append(result)
+        await hass.async_stop(force=True)
+
+    args.output.write_text(
+        json.dumps(
+            {
+                "version": manifest["version"],
+                "python": platform.python_version(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,316 @@
+"""Pseudo-terminal emulator of a JeeLink stick running the pcaSerial firmware.
+
+Simulates a number of virtual PCA301 plugs behind a pty so the
+integration (or ``PCA`` directly) can be exercised without hardware:
+
+    python benchmarks/emulator.py --plugs 200 --report-rate 0.05 --loss 0.02
+
+and point the integration at the printed device path (or ``--link``).
+
+The emulator answers ``<chan>,4,a1,a2,a3,...s`` status requests and
+``<chan>,5,a1,a2,a3,<state>,...s`` switch commands with ``OK 24`` report
+frames, prints the firmware banner on ``v``, optionally sends unsolicited
+reports, pairing frames of new plugs, noise and garbled lines.
+"""
+
+import argparse
+import heapq
+import os
+import pty
+import random
+import select
+import threading
+import time
+import tty
+
+BANNER = b"\r\n[pcaSerial.1.0]\r\n"
+RADIO_DELAY = (0.02, 0.06)  # s, time until a plug answers a command
+
+
+class VirtualPlug:
+    """Simulated PCA301 plug."""
+
+    __slots__ = ("address", "channel", "state", "base_power", "power", "consumption")
+
+    def __init__(self, address, channel, base_power, state=1):
+        self.address = address
+        self.channel = channel
+        self.state = state
+        self.base_power = base_power
+        self.power = base_power
+        self.consumption = 0.0  # kWh
+
+    @property
+    def device_id(self):
+        a = self.address
+        return f"{a >> 16:03d}{a >> 8 & 0xFF:03d}{a & 0xFF:03d}"
+
+    def advance(self, elapsed, rnd):
+        """Let the plug draw power for ``elapsed`` seconds."""
+        if self.state and self.base_power:
+            self.power = max(0.0, self.base_power * rnd.uniform(0.9, 1.1))
+        else:
+            self.power = 0.0
+        self.consumption = (self.consumption + self.power * elapsed / 3.6e6) % 655.36
+
+    def report(self, command=4):
+        """Return the ``OK 24`` frame of the plug."""
+        a = self.address
+        power = min(int(self.power * 10), 0xFFFF)
+        consumption = int(self.consumption * 100)
+        return (
+            f"OK 24 {self.channel} {command} {a >> 16} {a >> 8 & 0xFF} {a & 0xFF} "
+            f"{self.state} {power >> 8} {power & 0xFF} "
+            f"{consumption >> 8} {consumption & 0xFF}"
+        ).encode("ascii")
+
+
+class StickEmulator:
+    """Serve virtual plugs on a pseudo-terminal."""
+
+    def __init__(
+        self,
+        plugs=10,
+        report_rate=0.0,
+        loss=0.0,
+        noise=0.0,
+        garble=0.0,
+        pairing=0,
+        pairing_interval=3.0,
+        seed=None,
+        report_hook=None,
+    ):
+        self._rnd = random.Random(seed)
+        self.plugs = {}
+        for _ in range(plugs):
+            plug = self._new_plug()
+            self.plugs[plug.address] = plug
+        self.pairing = {}  # plugs sending pairing frames until first addressed
+        for _ in range(pairing):
+            plug = self._new_plug()
+            self.pairing[plug.address] = plug
+        self.report_rate = report_rate  # unsolicited reports per plug and second
+        self.loss = loss  # probability that a command or report is lost
+        self.noise = noise  # probability of a noise line per emitted frame
+        self.garble = garble  # probability that a frame is garbled
+        self.pairing_interval = pairing_interval
+        self.report_hook = report_hook  # called with (time, frame) per report
+        self.stats = dict.fromkeys(
+            ("commands", "reports", "lost", "noise", "garbled", "unknown"), 0
+        )
+        self._events = []  # heap of (due, seq, kind, plug)
+        self._seq = 0
+        self._master = None
+        self._slave = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_tick = time.monotonic()
+        self._pending_rate = None  # applied by the emulator thread
+
+    def _new_plug(self):
+        rnd = self._rnd
+        while True:
+            address = rnd.randrange(1, 1 << 24)
+            if address not in self.plugs:
+                break
+        base_power = rnd.choice((0.0, 0.0, 2.5, 15.0, 60.0, 120.0, 800.0, 2000.0))
+        return VirtualPlug(address, rnd.randrange(1, 13), base_power)
+
+    @property
+    def port(self):
+        """Path of the slave side to open as serial port."""
+        return os.ttyname(self._slave)
+
+    def open(self):
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        now = time.monotonic()
+        if self.report_rate:
+            for plug in self.plugs.values():
+                self._schedule(now + self._rnd.expovariate(self.report_rate), "report", plug)
+        for plug in self.pairing.values():
+            self._schedule(now + self._rnd.uniform(0, self.pairing_interval), "pair", plug)
+        return self.port
+
+    def set_report_rate(self, report_rate):
+        """Change the unsolicited report rate (per plug and second)."""
+        self._pending_rate = report_rate
+
+    def close(self):
+        self.stop()
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def start(self):
+        """Run the emulator in a background thread."""
+        if self._master is None:
+            self.open()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run(self):
+        """Serve commands and emit frames until stop() is called."""
+        pending = b""
+        self._write(BANNER)
+        while not self._stop.is_set():
+            now = time.monotonic()
+            timeout = 0.05
+            if self._events:
+                timeout = min(timeout, max(0.0, self._events[0][0] - now))
+            readable, _, _ = select.select([self._master], [], [], timeout)
+            if readable:
+                try:
+                    pending += os.read(self._master, 4096)
+                except OSError:
+                    break
+                pending = self._handle_input(pending)
+            if self._pending_rate is not None:
+                self._apply_report_rate(self._pending_rate)
+            self._run_due_events()
+
+    def _apply_report_rate(self, report_rate):
+        self._pending_rate = None
+        self.report_rate = report_rate
+        self._events = [event for event in self._events if event[2] != "report"]
+        heapq.heapify(self._events)
+        if report_rate:
+            now = time.monotonic()
+            for plug in self.plugs.values():
+                self._schedule(now + self._rnd.expovariate(report_rate), "report", plug)
+
+    def _schedule(self, due, kind, plug):
+        self._seq += 1
+        heapq.heappush(self._events, (due, self._seq, kind, plug))
+
+    def _handle_input(self, data):
+        """Execute complete commands, return the unprocessed rest."""
+        start = 0
+        for index, char in enumerate(data):
+            if chr(char).isalpha():
+                self._command(data[start:index].decode("ascii", "replace"), chr(char))
+                start = index + 1
+        return data[start:]
+
+    def _command(self, args, letter):
+        self.stats["commands"] += 1
+        if letter == "v":
+            self._write(BANNER)
+            return
+        if letter != "s":
+            return
+        try:
+            values = [int(value) for value in args.split(",")]
+            channel, command, a1, a2, a3, value = values[:6]
+        except ValueError:
+            self.stats["unknown"] += 1
+            return
+        address = a1 << 16 | a2 << 8 | a3
+        plug = self.plugs.get(address)
+        if plug is None and address in self.pairing:
+            # The host paired the plug and talks to it now
+            plug = self.plugs[address] = self.pairing.pop(address)
+        if plug is None or plug.channel != channel:
+            self.stats["unknown"] += 1
+            return
+        if self._rnd.random() < self.loss:
+            self.stats["lost"] += 1
+            return
+        if command == 5:
+            plug.state = 1 if value else 0
+        if command in (4, 5):
+            self._schedule(time.monotonic() + self._rnd.uniform(*RADIO_DELAY), "answer", plug)
+
+    def _run_due_events(self):
+        now = time.monotonic()
+        elapsed, self._last_tick = now - self._last_tick, now
+        for plug in self.plugs.values():
+            plug.advance(elapsed, self._rnd)
+        while self._events and self._events[0][0] <= now:
+            _, _, kind, plug = heapq.heappop(self._events)
+            if kind == "report":
+                self._schedule(now + self._rnd.expovariate(self.report_rate), kind, plug)
+                if self._rnd.random() < self.loss:
+                    self.stats["lost"] += 1
+                    continue
+            elif kind == "pair":
+                if plug.address in self.plugs:
+                    continue
+                self._schedule(now + self.pairing_interval, kind, plug)
+            self._emit(plug.report())
+
+    def _emit(self, frame):
+        rnd = self._rnd
+        if rnd.random() < self.noise:
+            self.stats["noise"] += 1
+            junk = bytes(rnd.choice(b"0123456789 OK\x00\xff") for _ in range(rnd.randrange(2, 24)))
+            self._write(junk + b"\r\n")
+        if rnd.random() < self.garble:
+            self.stats["garbled"] += 1
+            kind = rnd.randrange(3)
+            if kind == 0:
+                frame = frame[: rnd.randrange(6, len(frame))]  # truncated
+            elif kind == 1:
+                frame = b"\x00\x13" + frame  # garbage in front
+            else:
+                self._write(frame[: rnd.randrange(6, len(frame))])  # lost line end
+        self.stats["reports"] += 1
+        if self.report_hook is not None:
+            self.report_hook(time.perf_counter(), frame)
+        self._write(frame + b"\r\n")
+
+    def _write(self, data):
+        os.write(self._master, data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plugs", type=int, default=10)
+    parser.add_argument("--report-rate", type=float, default=0.0, help="unsolicited reports per plug and second")
+    parser.add_argument("--loss", type=float, default=0.0, help="probability of a lost frame")
+    parser.add_argument("--noise", type=float, default=0.0, help="probability of a noise line")
+    parser.add_argument("--garble", type=float, default=0.0, help="probability of a garbled frame")
+    parser.add_argument("--pairing", type=int, default=0, help="new plugs sending pairing frames")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--link", help="create a symlink to the pty, e.g. /tmp/ttyPCA301")
+    args = parser.parse_args()
+
+    emulator = StickEmulator(
+        plugs=args.plugs,
+        report_rate=args.report_rate,
+        loss=args.loss,
+        noise=args.noise,
+        garble=args.garble,
+        pairing=args.pairing,
+        seed=args.seed,
+    )
+    port = emulator.open()
+    if args.link:
+        if os.path.islink(args.link):
+            os.unlink(args.link)
+        os.symlink(port, args.link)
+    print(f"Emulating {args.plugs} PCA301 plugs on {args.link or port}")
+    for plug in emulator.plugs.values():
+        print(f"  {plug.device_id}: channel {plug.channel}, {plug.base_power} W")
+    try:
+        emulator.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(emulator.stats)
+        if args.link and os.path.islink(args.link):
+            os.unlink(args.link)
+        emulator.close()
+
+
+if __name__ == "__main__":
+    main()
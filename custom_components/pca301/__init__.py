@@ -2,24 +2,75 @@
 
 
 from homeassistant.const import CONF_DEVICE
+import asyncio
 import logging
+from pathlib import Path
+
+import voluptuous as vol
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers import device_registry as dr
+from homeassistant.core import HomeAssistant, ServiceCall, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import config_validation as cv, device_registry as dr
 
+from .capture import DEFAULT_SLOTS, FrameCapture, async_replay
+from .const import CONF_CAPTURE_FILE, CONF_STATS_WINDOWS, DEFAULT_STATS_WINDOWS
+from .coordinator import PCACoordinator
+from .device_state import parse_channel
+from .filters import WriteFilter
+from .hub import PCAHub
 from .pypca import PCA
+from .rolling import RollingStats
+from .state_store import DeviceStateStore
 
 DOMAIN = "pca301"
 PLATFORMS = [Platform.SWITCH, Platform.SENSOR]
 _LOGGER = logging.getLogger(__name__)
 
+SET_STATES_SCHEMA = vol.Schema(
+    {vol.Required("states"): vol.Schema({cv.string: cv.boolean})}
+)
+DUMP_CAPTURE_SCHEMA = vol.Schema({vol.Optional(CONF_DEVICE): cv.string})
+REPLAY_CAPTURE_SCHEMA = vol.Schema(
+    {
+        vol.Required("filename"): cv.string,
+        vol.Optional("speed", default=1.0): vol.All(
+            vol.Coerce(float), vol.Range(min=0)
+        ),
+        vol.Optional(CONF_DEVICE): cv.string,
+    }
+)
+
+
+async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Migrate an old config entry."""
+    if entry.version > 1:
+        return False
+    if entry.minor_version < 2:
+        # The channel map stored the frames' decimal channel tokens as
+        # strings, which were read as hex: channels >= 10 were addressed
+        # wrongly. Store the channels as ints.
+        options = dict(entry.options)
+        channels = options.get("channels")
+        if channels:
+            options["channels"] = {
+                device_id: parse_channel(channel)
+                for device_id, channel in channels.items()
+            }
+        hass.config_entries.async_update_entry(entry, options=options, minor_version=2)
+        _LOGGER.info(f"Migrated PCA301 entry {entry.entry_id} to version 1.2")
+    return True
+
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up PCA301 from a config entry."""
     port = entry.data.get(CONF_DEVICE) or "/dev/ttyUSB0"
-    pca = PCA(hass, port)
+    # One hub for all sticks, it routes each command through the best one
+    hub = hass.data.setdefault(DOMAIN, {}).setdefault("hub", PCAHub())
+    pca = PCA(hass, port, hub=hub, entry_id=entry.entry_id)
+    # Fans out the updates of the PCA to the entities of this entry
+    PCACoordinator(hass, pca)
     # Load channel mapping from entry.options, if present
     channel_map = entry.options.get("channels")
     if channel_map:
@@ -28,9 +79,28 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     else:
         _LOGGER.info("[PCA301] Kein Channel-Mapping in entry.options gefunden.")
     await pca.async_load_known_devices(hass)
-    # Store hass reference for entity enabling
-    pca.open()
-    hass.data.setdefault(DOMAIN, {})[entry.entry_id] = pca
+    # Values of the last run, so entities do not start empty
+    pca.state_store = DeviceStateStore(hass, entry.entry_id, pca)
+    restored = await pca.state_store.async_restore()
+    _LOGGER.debug(f"[PCA301] Restored values of {restored} devices")
+    pca.write_filter = WriteFilter.from_options(entry.options)
+    # Raw traffic of the stick for dump_capture, memory-mapped if wanted
+    capture_path = None
+    if entry.options.get(CONF_CAPTURE_FILE):
+        capture_path = hass.config.path(".storage", f"{DOMAIN}.capture.{entry.entry_id}")
+    pca.capture = await hass.async_add_executor_job(
+        FrameCapture, DEFAULT_SLOTS, capture_path
+    )
+    # Rolling power statistics, windows in seconds
+    pca.rolling = RollingStats(
+        minutes * 60 for minutes in stats_windows(entry.options)
+    )
+    entry.async_on_unload(entry.add_update_listener(async_options_updated))
+    hub.add(pca)
+    # Connect in the background, the entities are created from the channel
+    # map right away and become available once the stick answered
+    pca.async_start()
+    hass.data[DOMAIN][entry.entry_id] = pca
 
     device_registry = dr.async_get(hass)
     devices = [
@@ -44,27 +114,15 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # Register scan_for_new_devices service here as well
     async def async_scan_for_new_devices_service(call):
         _LOGGER.info("Service pca301.scan_for_new_devices called, starting scan...")
-        # Always use the port from the first loaded config entry
-        entries = hass.config_entries.async_entries(DOMAIN)
+        # Scan on every loaded stick, the one hearing a new plug first keeps it
+        entries = [
+            config_entry
+            for config_entry in hass.config_entries.async_entries(DOMAIN)
+            if config_entry.entry_id in hass.data.get(DOMAIN, {})
+        ]
         if not entries:
             _LOGGER.warning("No config entry found for PCA301 scan service.")
             return
-        device = entries[0].data.get(CONF_DEVICE) or "/dev/ttyUSB0"
-        _LOGGER.info(f"Using port from config entry: {device}")
-
-        # Find the matching config entry to load existing known devices
-        config_entry = None
-        for entry_tmp in entries:
-            if entry.data.get(CONF_DEVICE) == device:
-                config_entry = entry_tmp
-                break
-
-        pca = PCA(hass, device)
-
-        # Load existing channel mapping from entry.options
-        if config_entry and config_entry.options.get("channels"):
-            pca.known_devices = config_entry.options["channels"].copy()
-            _LOGGER.info(f"Loaded existing channel mapping: {pca.known_devices}")
 
         hass.async_create_task(
             hass.services.async_call(
@@ -78,13 +136,10 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
                 blocking=False,
             )
         )
-        new_device_ids = await hass.async_add_executor_job(pca.start_scan)
-        # Debug log before saving channel mapping
-        _LOGGER.debug(
-            f"[PCA301] Vor save_channel_mapping: device={device}, known_devices={pca.known_devices}"
+        results = await asyncio.gather(
+            *(async_scan_entry(hass, config_entry) for config_entry in entries),
+            return_exceptions=True,
         )
-        # After scan: Save channel mapping in entry.options
-        save_channel_mapping(hass, device, pca.known_devices)
         hass.async_create_task(
             hass.services.async_call(
                 "persistent_notification",
@@ -93,18 +148,102 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
                 blocking=False,
             )
         )
-        _LOGGER.info("Scan complete, found: %s", new_device_ids)
+        _LOGGER.info("Scan complete, found: %s", results)
 
     # _LOGGER.info("Registering scan_for_new_devices service in async_setup_entry")
     hass.services.async_register(
         DOMAIN, "scan_for_new_devices", async_scan_for_new_devices_service
     )
 
+    async def async_set_states_service(call: ServiceCall):
+        """Switch many plugs at once, grouped by the stick that knows them."""
+        states = call.data["states"]
+        batches = {}
+        results = {}
+        for device_id, on in states.items():
+            pca_for_device = _find_pca(hass, device_id)
+            if pca_for_device is None:
+                _LOGGER.warning(f"set_states: unknown PCA301 device {device_id}")
+                results[device_id] = "unknown"
+                continue
+            batches.setdefault(pca_for_device, {})[device_id] = on
+        for pca_for_device, batch in batches.items():
+            results.update(await pca_for_device.async_set_states(batch))
+        return {"results": results}
+
+    hass.services.async_register(
+        DOMAIN,
+        "set_states",
+        async_set_states_service,
+        schema=SET_STATES_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def async_dump_capture_service(call: ServiceCall):
+        """Write the captured raw traffic of the sticks to the config dir."""
+        files = {}
+        for pca_to_dump in _loaded_pcas(hass, call.data.get(CONF_DEVICE)):
+            path = hass.config.path(f"pca301_capture_{Path(pca_to_dump.port).name}.txt")
+            records = await hass.async_add_executor_job(pca_to_dump.capture.dump, path)
+            _LOGGER.info(f"Wrote {records} captured lines of {pca_to_dump.port} to {path}")
+            files[pca_to_dump.port] = {"path": path, "records": records}
+        return {"files": files}
+
+    hass.services.async_register(
+        DOMAIN,
+        "dump_capture",
+        async_dump_capture_service,
+        schema=DUMP_CAPTURE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def async_replay_capture_service(call: ServiceCall):
+        """Feed a capture file through a scratch PCA and return what it decoded.
+
+        The loaded sticks, their entities and stored values stay untouched:
+        old values must not overwrite live ones (an older consumption would
+        look like a meter reset to the energy statistics).
+        """
+        path = hass.config.path(call.data["filename"])
+        if not hass.config.is_allowed_path(path):
+            raise HomeAssistantError(f"Access to {path} is not allowed")
+        pcas = _loaded_pcas(hass, call.data.get(CONF_DEVICE))
+        if not pcas:
+            raise HomeAssistantError("No PCA301 stick loaded")
+        # No coordinator, store, hub or entry: nothing reaches the entities
+        scratch = PCA(hass, pcas[0].port, status_polling=False)
+        scratch.known_devices = dict(pcas[0].known_devices)
+        frames = await async_replay(scratch, path, call.data["speed"])
+        _LOGGER.info(f"Replayed {frames} lines of {path} with the channels of {pcas[0].port}")
+        return {
+            "frames": frames,
+            "stats": scratch.get_stats(),
+            "devices": {
+                device_id: snapshot._asdict()
+                for device_id, snapshot in scratch.get_devices().items()
+            },
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        "replay_capture",
+        async_replay_capture_service,
+        schema=REPLAY_CAPTURE_SCHEMA,
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
     # Register platforms (e.g. switch, sensor)
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     return True
 
 
+async def async_options_updated(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Apply changed filter options, without reloading the entry."""
+    pca = hass.data[DOMAIN].get(entry.entry_id)
+    if pca is not None:
+        pca.write_filter = WriteFilter.from_options(entry.options)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     # Unload platforms first
@@ -114,11 +253,19 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     if unload_ok:
         pca = hass.data[DOMAIN].pop(entry.entry_id, None)
         if pca is not None:
+            hass.data[DOMAIN]["hub"].remove(pca)
             pca.close()
+            await pca.state_store.async_save()
+            await hass.async_add_executor_job(pca.capture.close)
 
     return unload_ok
 
 
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Remove the stored plug values of a deleted entry."""
+    await DeviceStateStore(hass, entry.entry_id, None).async_remove()
+
+
 async def async_remove_config_entry_device(
     hass: HomeAssistant, config_entry: ConfigEntry, device_entry: dr.DeviceEntry
 ) -> bool:
@@ -132,6 +279,9 @@ async def async_remove_config_entry_device(
 
     if not device_id:
         return True
+    if device_id == config_entry.entry_id:
+        # Hub device of the stick, goes away with the config entry
+        return False
 
     # Remove device from known_devices and channel mapping
     pca = hass.data[DOMAIN].get(config_entry.entry_id)
@@ -152,16 +302,49 @@ async def async_remove_config_entry_device(
     return True
 
 
-def save_channel_mapping(hass, device, known_devices):
-    """Speichere das Channel-Mapping für das passende ConfigEntry in entry.options."""
-    config_entries = hass.config_entries.async_entries(DOMAIN)
-    for config_entry in config_entries:
-        if config_entry.data.get(CONF_DEVICE) == device:
-            new_channels = known_devices.copy()
-            _LOGGER.info(
-                f"[PCA301] Speichere Channel-Mapping in entry.options: {new_channels}"
-            )
-            options = dict(config_entry.options)
-            options["channels"] = new_channels
-            hass.config_entries.async_update_entry(config_entry, options=options)
-            break
\ No newline at end of file
+async def async_scan_entry(hass, entry, fast=0):
+    """Scan for new plugs on the running stick of an entry, return their ids.
+
+    The connection stays up. The PCA announces each new plug as it is
+    found, so its entities are created right away, and the channel map
+    is stored once the scan is over.
+    """
+    pca = hass.data[DOMAIN][entry.entry_id]
+    new_device_ids = await pca.async_start_scan(fast)
+    if new_device_ids:
+        options = dict(entry.options)
+        options["channels"] = pca.known_devices.copy()
+        hass.config_entries.async_update_entry(entry, options=options)
+    return new_device_ids
+
+
+def stats_windows(options):
+    """Return the rolling statistics windows (minutes) of the entry options."""
+    windows = set()
+    for value in str(options.get(CONF_STATS_WINDOWS, DEFAULT_STATS_WINDOWS)).split(","):
+        try:
+            minutes = int(value)
+        except ValueError:
+            continue
+        if minutes > 0:
+            windows.add(minutes)
+    return sorted(windows)
+
+
+def _loaded_pcas(hass, port=None):
+    """Return the PCA instances of the loaded entries, optionally of one port."""
+    pcas = []
+    for config_entry in hass.config_entries.async_entries(DOMAIN):
+        pca = hass.data.get(DOMAIN, {}).get(config_entry.entry_id)
+        if pca is not None and (port is None or pca.port == port):
+            pcas.append(pca)
+    return pcas
+
+
+def _find_pca(hass, device_id):
+    """Return the PCA instance whose channel map contains a device."""
+    for config_entry in hass.config_entries.async_entries(DOMAIN):
+        pca = hass.data.get(DOMAIN, {}).get(config_entry.entry_id)
+        if pca is not None and device_id in pca.known_devices:
+            return pca
+    return None
@@ -0,0 +1,148 @@
+"""Always-on capture of the raw serial traffic in a fixed-size ring buffer.
+
+Every received line and every sent command is stored with a monotonic
+timestamp in a fixed-size slot, so recording is one ``struct.pack_into``
+and a slice copy, no formatting and no allocation. The buffer can be
+backed by a memory-mapped file, which then survives a crash. ``dump``
+writes the captured traffic as text and ``async_replay`` feeds such a
+file (or a plain capture with one line per frame) back through a PCA,
+which should be a scratch instance, not the one of a loaded entry.
+
+Nothing in here depends on Home Assistant.
+"""
+
+import asyncio
+import mmap
+import struct
+import time
+
+RX = 0  # line received from the stick
+TX = 1  # command sent to the stick
+
+SLOT_SIZE = 64  # bytes per record, longer lines are truncated
+DEFAULT_SLOTS = 4096  # 256 KiB, a few hours of traffic of a small site
+
+_HEADER = struct.Struct("<Q")  # number of records written so far
+_RECORD = struct.Struct("<dBB")  # monotonic time, direction, payload length
+_PAYLOAD = SLOT_SIZE - _RECORD.size
+_MARKS = {RX: "<", TX: ">"}
+
+
+class FrameCapture:
+    """Ring buffer of the last ``slots`` lines sent or received."""
+
+    __slots__ = ("_slots", "_buffer", "_file", "_count")
+
+    def __init__(self, slots=DEFAULT_SLOTS, path=None):
+        self._slots = slots
+        size = _HEADER.size + slots * SLOT_SIZE
+        self._file = None
+        if path is None:
+            self._buffer = bytearray(size)
+            self._count = 0
+            return
+        # Memory-mapped: keeps the records of a previous run if the size fits
+        self._file = open(path, "a+b")
+        resized = self._file.seek(0, 2) != size
+        if resized:
+            self._file.truncate(size)
+        self._buffer = mmap.mmap(self._file.fileno(), size)
+        if resized:
+            _HEADER.pack_into(self._buffer, 0, 0)
+        self._count = _HEADER.unpack_from(self._buffer)[0]
+
+    @property
+    def count(self):
+        """Return the number of records written since the buffer was created."""
+        return self._count
+
+    def record(self, direction, data):
+        """Store one line (RX) or command (TX)."""
+        count = self._count
+        offset = _HEADER.size + count % self._slots * SLOT_SIZE
+        length = min(len(data), _PAYLOAD)
+        buffer = self._buffer
+        _RECORD.pack_into(buffer, offset, time.monotonic(), direction, length)
+        offset += _RECORD.size
+        buffer[offset : offset + length] = data[:length]
+        self._count = count = count + 1
+        _HEADER.pack_into(buffer, 0, count)
+
+    def records(self):
+        """Return the stored records as (time, direction, data), oldest first."""
+        count = self._count
+        first = max(0, count - self._slots)
+        buffer = self._buffer
+        records = []
+        for index in range(first, count):
+            offset = _HEADER.size + index % self._slots * SLOT_SIZE
+            timestamp, direction, length = _RECORD.unpack_from(buffer, offset)
+            offset += _RECORD.size
+            records.append((timestamp, direction, bytes(buffer[offset : offset + length])))
+        return records
+
+    def dump(self, path):
+        """Write the records to a text file, return the number of records.
+
+        One record per line: seconds since the first record, ``<`` for
+        received and ``>`` for sent, and the line itself.
+        """
+        records = self.records()
+        start = records[0][0] if records else 0.0
+        with open(path, "w", encoding="ascii", errors="backslashreplace") as file:
+            for timestamp, direction, data in records:
+                line = data.decode("ascii", "backslashreplace")
+                file.write(f"{timestamp - start:.6f} {_MARKS[direction]} {line}\n")
+        return len(records)
+
+    def close(self):
+        if self._file is not None:
+            self._buffer.close()
+            self._file.close()
+            self._file = None
+
+
+def load_capture(path):
+    """Read a dump (or a plain one-line-per-frame capture).
+
+    Returns the received lines as (seconds, data); lines of a plain
+    capture have no timing and get 0.
+    """
+    frames = []
+    with open(path, "rb") as file:
+        for line in file:
+            line = line.rstrip(b"\r\n")
+            parts = line.split(b" ", 2)
+            if len(parts) == 3 and parts[1] in (b"<", b">"):
+                try:
+                    seconds = float(parts[0])
+                except ValueError:
+                    pass
+                else:
+                    if parts[1] == b"<":
+                        frames.append((seconds, parts[2]))
+                    continue
+            if line:
+                frames.append((0.0, line))
+    return frames
+
+
+async def async_replay(pca, path, speed=1.0):
+    """Feed the received lines of a capture file through a PCA.
+
+    ``speed`` scales the original timing (2 = twice as fast), 0 replays
+    as fast as possible. Returns the number of replayed lines.
+    """
+    loop = asyncio.get_running_loop()
+    frames = await loop.run_in_executor(None, load_capture, path)
+    start = loop.time()
+    for index, (seconds, line) in enumerate(frames):
+        if speed:
+            delay = start + seconds / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif not index % 100:
+            # Let the flushes and everything else run in between
+            await asyncio.sleep(0)
+        pca.replay_line(line)
+    return len(frames)
@@ -1,8 +1,5 @@
 """Config flow for PCA301 integration."""
 
-import asyncio
-import contextlib
-import glob
 import logging
 
 
@@ -22,17 +19,36 @@ from homeassistant.data_entry_flow import progress_step
 from homeassistant.helpers.selector import TextSelector
 from homeassistant.helpers.translation import async_get_cached_translations
 
+from . import _loaded_pcas, async_scan_entry
 from .const import DOMAIN, DEFAULT_DEVICE
 from .pypca import PCA
 from .options_flow import PCA301OptionsFlowHandler
+from .serial_helper import async_list_pca_ports
 
 _LOGGER = logging.getLogger(__name__)
 
 
+async def _async_scan_port(hass, device, known_devices):
+    """Scan on a port no loaded entry uses, with a temporary connection.
+
+    Returns the new device ids and the updated channel map.
+    """
+    pca = PCA(hass, device, status_polling=False)
+    pca.known_devices = dict(known_devices)
+    await pca.async_open()
+    try:
+        new_device_ids = await pca.async_start_scan()
+    finally:
+        pca.close()
+    return new_device_ids, pca.known_devices
+
+
 class PCA301ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     """Handle a config flow for PCA301."""
 
     VERSION = 1
+    # 1.2: channel map values are ints instead of the frames' channel tokens
+    MINOR_VERSION = 2
     CONNECTION_CLASS = config_entries.CONN_CLASS_LOCAL_POLL
 
     def __init__(self):
@@ -58,10 +74,6 @@ class PCA301ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         """Handle the initial step of the config flow."""
         errors = {}
         hass = self.hass
-        usb_ports = await hass.async_add_executor_job(glob.glob, "/dev/ttyUSB*")
-        acm_ports = await hass.async_add_executor_job(glob.glob, "/dev/ttyACM*")
-        serial_ports = usb_ports + acm_ports
-        port_options = serial_ports if serial_ports else [DEFAULT_DEVICE]
 
         if user_input is not None:
             if CONF_DEVICE in user_input:
@@ -69,6 +81,12 @@ class PCA301ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                 return await self.async_step_scan_press_button()
             errors["base"] = "no_device_selected"
 
+        # Only ports with a JeeLink answering, under their /dev/serial/by-id name
+        serial_ports = await async_list_pca_ports(
+            hass, [pca.port for pca in _loaded_pcas(hass)]
+        )
+        port_options = serial_ports if serial_ports else [DEFAULT_DEVICE]
+
         return self.async_show_form(
             step_id="user",
             data_schema=vol.Schema(
@@ -102,91 +120,47 @@ class PCA301ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             )
 
         # Suche existierenden ConfigEntry für das gewählte device
-        config_entries_list = self.hass.config_entries.async_entries(DOMAIN)
-        entry_to_reload = None
-        for config_entry in config_entries_list:
+        existing_entry = None
+        for config_entry in self.hass.config_entries.async_entries(DOMAIN):
             if config_entry.data.get(CONF_DEVICE) == device:
-                entry_to_reload = config_entry
+                existing_entry = config_entry
                 break
 
-        # Wenn Integration geladen, temporär entladen
-        if entry_to_reload:
-            _LOGGER.info(
-                f"[PCA301] entry_to_reload.state vor Unload: {entry_to_reload.state}"
-            )
-        if entry_to_reload and entry_to_reload.state == ConfigEntryState.LOADED:
-            _LOGGER.info(
-                f"[PCA301] Unloading integration for port {device} before scan..."
-            )
-            await self.hass.config_entries.async_unload_entry(entry_to_reload.entry_id)
-            _LOGGER.info(
-                f"[PCA301] entry_to_reload.state nach Unload: {entry_to_reload.state}"
-            )
-            # Warten, damit der Port wirklich freigegeben ist
-            await asyncio.sleep(1)
-
         try:
-            logger = _LOGGER
-            logger.info(f"Starting direct scan for new devices on {device}")
-            pca = PCA(self.hass, device)
-            await pca.async_load_known_devices(self.hass)
-            new_device_ids = await self.hass.async_add_executor_job(pca.start_scan)
-            logger.info(f"Direct scan complete, found: {new_device_ids}")
-            try:
-                pca.close()
-            except Exception as close_err:
-                logger.warning(f"Error closing serial port after scan: {close_err}")
-
-            # Speichere Channel-Mapping direkt
-            if entry_to_reload:
-                new_channels = pca.known_devices.copy()
-                _LOGGER.info(
-                    f"[PCA301] Speichere Channel-Mapping in entry.options: {new_channels}"
+            _LOGGER.info(f"Starting scan for new devices on {device}")
+            if existing_entry and existing_entry.state == ConfigEntryState.LOADED:
+                # Scan on the running connection, the entry stays loaded
+                new_device_ids = await async_scan_entry(self.hass, existing_entry)
+                known_devices = self.hass.data[DOMAIN][
+                    existing_entry.entry_id
+                ].known_devices.copy()
+            else:
+                known_devices = (
+                    existing_entry.options.get("channels", {}) if existing_entry else {}
                 )
-                options = dict(entry_to_reload.options)
-                options["channels"] = new_channels
-                self.hass.config_entries.async_update_entry(
-                    entry_to_reload, options=options
+                new_device_ids, known_devices = await _async_scan_port(
+                    self.hass, device, known_devices
                 )
-
-            _LOGGER.info(
-                f"[PCA301] Gerätezustände nach Scan (ConfigFlow): _devices={pca._devices}"
-            )
+                if existing_entry:
+                    options = dict(existing_entry.options)
+                    options["channels"] = known_devices.copy()
+                    self.hass.config_entries.async_update_entry(
+                        existing_entry, options=options
+                    )
+            _LOGGER.info(f"Scan complete, found: {new_device_ids}")
         except Exception as err:
-            _LOGGER.error("Direct scan failed: %s", err)
-            # Nach Fehler Integration ggf. wieder laden
-            if (
-                entry_to_reload
-                and entry_to_reload.state == ConfigEntryState.NOT_LOADED
-            ):
-                await self.hass.config_entries.async_setup(entry_to_reload.entry_id)
+            _LOGGER.error("Scan failed: %s", err)
             return self.async_show_form(
                 step_id="user",
                 errors={"base": "scan_failed"},
             )
 
-        # Nach Scan Integration wieder laden
-        if (
-            entry_to_reload
-            and entry_to_reload.state == ConfigEntryState.NOT_LOADED
-        ):
-            _LOGGER.info(
-                f"[PCA301] entry_to_reload.state vor Reload: {entry_to_reload.state}"
-            )
-            _LOGGER.info(
-                f"[PCA301] Reloading integration for port {device} after scan..."
-            )
-            await self.hass.config_entries.async_setup(entry_to_reload.entry_id)
-            _LOGGER.info(
-                f"[PCA301] entry_to_reload.state nach Reload: {entry_to_reload.state}"
-            )
-
         return self.async_create_entry(
             title="PCA301",
             data={CONF_DEVICE: self._selected_device},
             options={
                 "devices": new_device_ids,
-                "channels": pca.known_devices.copy(),
+                "channels": known_devices.copy(),
             },
         )
 
@@ -227,47 +201,30 @@ class PCA301ScanDeviceFlowHandler(ConfigSubentryFlow):
         if not device:
             return self.async_abort(reason="no_device")
 
-        # Unload integration before scan to free serial port
-        await self.hass.config_entries.async_unload(config_entry.entry_id)
-        await asyncio.sleep(1)
-
         try:
-            pca = PCA(self.hass, device)
-            # Load existing channel mapping
-            existing_channels = config_entry.options.get("channels", {}).copy()
-            if existing_channels:
-                pca.known_devices = existing_channels.copy()
-                _LOGGER.info(f"Loaded existing channel mapping: {pca.known_devices}")
-
-            new_device_ids = await self.hass.async_add_executor_job(pca.start_scan)
+            if config_entry.state == ConfigEntryState.LOADED:
+                # Scan on the running connection, the plugs stay available
+                new_device_ids = await async_scan_entry(self.hass, config_entry)
+            else:
+                new_device_ids, known_devices = await _async_scan_port(
+                    self.hass, device, config_entry.options.get("channels", {})
+                )
+                new_options = dict(config_entry.options)
+                new_options["channels"] = known_devices.copy()
+                self.hass.config_entries.async_update_entry(
+                    config_entry, options=new_options
+                )
             _LOGGER.info(f"Scan complete, found: {new_device_ids}")
-
-            # Merge new channels with existing channels
-            merged_channels = existing_channels.copy()
-            merged_channels.update(pca.known_devices)
-
-            new_options = dict(config_entry.options)
-            new_options["channels"] = merged_channels
-
-            self.hass.config_entries.async_update_entry(
-                config_entry, options=new_options
-            )
-
-            with contextlib.suppress(Exception):
-                pca.close()
-
         except Exception as err:
             _LOGGER.error("Scan failed: %s", err)
-        finally:
-            # Reload integration after scan only if NOT_LOADED
-            if config_entry.state == ConfigEntryState.NOT_LOADED:
-                await self.hass.config_entries.async_setup(config_entry.entry_id)
 
         # Always show all known devices after scan
         pca = self.hass.data.get(DOMAIN, {}).get(config_entry.entry_id)
         all_devices = []
         if pca and hasattr(pca, "get_devices"):
             all_devices = list(pca.get_devices().keys())
+        else:
+            all_devices = list(config_entry.options.get("channels", {}))
 
         device_list = "\n".join(all_devices) if all_devices else ""
 
@@ -1,2 +1,21 @@
 DOMAIN = "pca301"
 DEFAULT_DEVICE = "/dev/ttyUSB0"
+
+# Dispatcher signal of a config entry with a list of newly found device ids
+SIGNAL_NEW_DEVICES = "pca301_new_devices_{}"
+
+# Options filtering state writes (0 = off)
+CONF_POWER_DEADBAND = "power_deadband"  # W
+CONF_POWER_DEADBAND_PERCENT = "power_deadband_percent"  # % of the last power
+CONF_MIN_INTERVAL = "min_interval"  # s between power writes
+CONF_HEARTBEAT = "heartbeat"  # s after which a write is forced
+
+# Option: keep the raw traffic capture in a memory-mapped file
+CONF_CAPTURE_FILE = "capture_file"
+
+# Option: windows (minutes) of the rolling power statistics sensors
+CONF_STATS_WINDOWS = "stats_windows"
+DEFAULT_STATS_WINDOWS = "15, 60"
+# Part of the unique id of the optional statistics sensors, they stay
+# disabled until the user enables them
+STATS_UNIQUE_ID_MARKER = "_stats_"
@@ -0,0 +1,68 @@
+"""Per-entry coordinator between a PCA and its entities."""
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+
+
+class PCACoordinator:
+    """Fan out the updates of one PCA to the subscribed entities.
+
+    The PCA pushes the devices with new values once per event loop tick,
+    with the names of the values to write; the coordinator calls the
+    listeners of exactly those values. Entities then read the values
+    synchronously from the PCA, there is no polling, locking or executor
+    use involved.
+    """
+
+    def __init__(self, hass: HomeAssistant, pca) -> None:
+        self.hass = hass
+        self.pca = pca
+        self._listeners = {}  # deviceId: list of (value name or None, callback)
+        self._connection_listeners = []
+        pca.coordinator = self
+
+    @callback
+    def async_add_listener(
+        self, device_id, update_callback, value=None
+    ) -> CALLBACK_TYPE:
+        """Call ``update_callback`` when a value of a device is to be written.
+
+        ``value`` (``"state"``, ``"power"`` or ``"consumption"``) limits
+        the calls to that value, None means any.
+        """
+        listeners = self._listeners.setdefault(device_id, [])
+        listener = (value, update_callback)
+        listeners.append(listener)
+
+        @callback
+        def remove_listener():
+            listeners.remove(listener)
+            if not listeners:
+                self._listeners.pop(device_id, None)
+
+        return remove_listener
+
+    @callback
+    def async_add_connection_listener(self, update_callback) -> CALLBACK_TYPE:
+        """Call ``update_callback`` when the stick got ready or was lost."""
+        self._connection_listeners.append(update_callback)
+
+        @callback
+        def remove_listener():
+            self._connection_listeners.remove(update_callback)
+
+        return remove_listener
+
+    @callback
+    def async_devices_updated(self, updates):
+        """Notify the listeners of {deviceId: value names} (called by the PCA)."""
+        listeners = self._listeners
+        for device_id, values in updates.items():
+            for value, update_callback in listeners.get(device_id, ()):
+                if value is None or value in values:
+                    update_callback()
+
+    @callback
+    def async_connection_changed(self):
+        """Notify all connection listeners (called by the PCA)."""
+        for update_callback in list(self._connection_listeners):
+            update_callback()
@@ -0,0 +1,93 @@
+"""Per-plug state records kept by the PCA class."""
+
+from typing import NamedTuple
+
+# Values of a plug that entities show, as named in update()'s result
+STATE = "state"
+POWER = "power"
+CONSUMPTION = "consumption"
+VALUES = frozenset((STATE, POWER, CONSUMPTION))
+
+
+class DeviceSnapshot(NamedTuple):
+    """Consistent, immutable copy of the values of one plug.
+
+    ``version`` is the PCA-wide change counter at the time the values were
+    published, a higher version means newer values.
+    """
+
+    channel: int | None
+    state: int | None
+    power: float | None
+    consumption: float | None
+    last_updated: float | None
+    version: int = 0
+
+
+class DeviceState:
+    """Last known values of one plug, None means not reported yet."""
+
+    __slots__ = ("channel", "state", "power", "consumption", "last_updated", "version")
+
+    def __init__(self, channel=None):
+        self.channel = channel
+        self.state = None
+        self.power = None
+        self.consumption = None
+        self.last_updated = None
+        self.version = 0
+
+    def update(self, report, now):
+        """Apply a decoded report, return the set of the changed values."""
+        changed = set()
+        if self.state != report.state:
+            changed.add(STATE)
+        if self.power != report.power:
+            changed.add(POWER)
+        if self.consumption != report.consumption:
+            changed.add(CONSUMPTION)
+        self.channel = report.channel
+        self.state = report.state
+        self.power = report.power
+        self.consumption = report.consumption
+        self.last_updated = now
+        return changed
+
+    def restore(self, state, power, consumption, last_updated):
+        """Take over values saved before a restart."""
+        self.state = state
+        self.power = power
+        self.consumption = consumption
+        self.last_updated = last_updated
+
+    def snapshot(self):
+        """Return the current values as one immutable tuple."""
+        return DeviceSnapshot(
+            self.channel,
+            self.state,
+            self.power,
+            self.consumption,
+            self.last_updated,
+            self.version,
+        )
+
+    def __repr__(self):
+        return (
+            f"DeviceState(channel={self.channel}, state={self.state}, "
+            f"power={self.power}, consumption={self.consumption})"
+        )
+
+
+def parse_channel(channel):
+    """Return the radio channel of a channel map value as int.
+
+    Channel maps hold ints since config entry version 1.2. Older entries
+    stored the decimal channel token of the report frame as string; only
+    strings that are no decimal number are read as hex.
+    """
+    if channel is None or isinstance(channel, int):
+        return channel
+    try:
+        return int(channel)
+    except ValueError:
+        return int(channel, 16)
@@ -0,0 +1,33 @@
+"""Diagnostics support for PCA301."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import DOMAIN
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    pca = hass.data.get(DOMAIN, {}).get(entry.entry_id)
+    data: dict[str, Any] = {
+        "entry": {"data": dict(entry.data), "options": dict(entry.options)},
+    }
+    if pca is None:
+        return data
+    data["port"] = pca.port
+    data["stats"] = pca.get_stats()
+    data["devices"] = {
+        device_id: snapshot._asdict()
+        for device_id, snapshot in pca.get_devices().items()
+    }
+    data["version"] = pca.version
+    # Which stick heard each plug when, and how reliably it answered
+    hub = hass.data[DOMAIN]["hub"]
+    data["routes"] = {device_id: hub.link_info(device_id) for device_id in pca.known_devices}
+    return data
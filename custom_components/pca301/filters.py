@@ -0,0 +1,83 @@
+"""Filtering of report-driven state writes to reduce recorder load."""
+
+from .const import (
+    CONF_HEARTBEAT,
+    CONF_MIN_INTERVAL,
+    CONF_POWER_DEADBAND,
+    CONF_POWER_DEADBAND_PERCENT,
+)
+from .device_state import CONSUMPTION, POWER, STATE, VALUES
+
+
+class WriteFilter:
+    """Decide which reports of a plug are worth writing to its entities.
+
+    The stored device values are always updated, only the notification of
+    the entities is skipped. Each value is decided on its own, so a
+    changing energy counter does not drag the power along. Switch state
+    and consumption changes are always written (consumption is the plug's
+    own energy counter, so no energy gets lost). Power changes are written
+    if they leave the deadband around the last written power (absolute W
+    or percent, whichever is larger) and at least ``min_interval`` seconds
+    passed; ``heartbeat`` forces a power write after that many seconds
+    regardless.
+    """
+
+    __slots__ = ("deadband", "deadband_percent", "min_interval", "heartbeat", "_written")
+
+    def __init__(self, deadband=0.0, deadband_percent=0.0, min_interval=0.0, heartbeat=0.0):
+        self.deadband = deadband
+        self.deadband_percent = deadband_percent
+        self.min_interval = min_interval
+        self.heartbeat = heartbeat
+        self._written = {}  # deviceId: [power time, state, power, consumption] written
+
+    @classmethod
+    def from_options(cls, options):
+        """Return a filter for the entry options, None if filtering is off."""
+        write_filter = cls(
+            float(options.get(CONF_POWER_DEADBAND, 0)),
+            float(options.get(CONF_POWER_DEADBAND_PERCENT, 0)),
+            float(options.get(CONF_MIN_INTERVAL, 0)),
+            float(options.get(CONF_HEARTBEAT, 0)),
+        )
+        if not (
+            write_filter.deadband
+            or write_filter.deadband_percent
+            or write_filter.min_interval
+            or write_filter.heartbeat
+        ):
+            return None
+        return write_filter
+
+    def should_write(self, deviceId, device, now):
+        """Return the set of the values of a device that should be written."""
+        written = self._written.get(deviceId)
+        if written is None:
+            self._written[deviceId] = [now, device.state, device.power, device.consumption]
+            return VALUES
+        values = set()
+        if device.state != written[1]:
+            written[1] = device.state
+            values.add(STATE)
+        if device.consumption != written[3]:
+            written[3] = device.consumption
+            values.add(CONSUMPTION)
+        # Switching usually changes the power as well, show both together
+        if STATE in values or self._power_due(written, device.power, now):
+            written[0] = now
+            written[2] = device.power
+            values.add(POWER)
+        return values
+
+    def _power_due(self, written, power, now):
+        last_time, _, last_power, _ = written
+        elapsed = now - last_time
+        if self.heartbeat and elapsed >= self.heartbeat:
+            return True
+        if elapsed < self.min_interval or power == last_power:
+            return False
+        if power is None or last_power is None:
+            return True
+        band = max(self.deadband, abs(last_power) * self.deadband_percent / 100)
+        return abs(power - last_power) > band
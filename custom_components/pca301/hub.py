@@ -0,0 +1,172 @@
+"""Routing of commands across several JeeLink sticks.
+
+Each config entry owns one ``PCA`` on one serial port and the channel map
+of the plugs it scanned. With several sticks (for radio coverage) every
+stick may hear every plug: the hub records which stick heard a plug last
+and how reliably commands sent through it were answered, hands reports
+to the PCA owning the plug and sends commands through the best stick,
+failing over to the next one if a stick gets no answer.
+"""
+
+import logging
+import time
+
+from .device_state import parse_channel
+from .pypca import PCACommandError
+
+_LOGGER = logging.getLogger(__name__)
+
+LINK_STALE = 600  # s, a stick that did not hear a plug for this long is a last resort
+RELIABILITY_WEIGHT = 0.2  # weight of the latest command result in the reliability
+DUPLICATE_WINDOW = 1.0  # s, an identical report within this time was heard twice
+
+
+class _Link:
+    """What one stick knows about reaching one plug."""
+
+    __slots__ = ("last_heard", "reliability")
+
+    def __init__(self):
+        self.last_heard = None
+        self.reliability = 1.0  # moving average of answered commands
+
+    def as_dict(self):
+        return {"last_heard": self.last_heard, "reliability": round(self.reliability, 3)}
+
+
+class PCAHub:
+    """Route commands for PCA301 plugs through the best of several sticks."""
+
+    def __init__(self):
+        self._sticks = []  # PCA instances, in setup order
+        self._links = {}  # (deviceId, port): _Link
+        self._last_reports = {}  # deviceId: (report, time) last applied
+
+    @property
+    def sticks(self):
+        return list(self._sticks)
+
+    def add(self, pca):
+        """Register a stick."""
+        self._sticks.append(pca)
+
+    def remove(self, pca):
+        """Forget a stick and what it heard."""
+        if pca in self._sticks:
+            self._sticks.remove(pca)
+        for key in [key for key in self._links if key[1] == pca.port]:
+            del self._links[key]
+
+    def owner(self, deviceId):
+        """Return the PCA whose channel map contains a device, or None."""
+        for pca in self._sticks:
+            if deviceId in pca.known_devices:
+                return pca
+        return None
+
+    def channel(self, deviceId):
+        """Return the radio channel of a device."""
+        owner = self.owner(deviceId)
+        if owner is not None:
+            return parse_channel(owner.known_devices[deviceId])
+        # Not scanned yet, take the channel of its last report
+        for pca in self._sticks:
+            snapshot = pca.get_snapshot(deviceId)
+            if snapshot is not None and snapshot.channel is not None:
+                return snapshot.channel
+        return 1
+
+    def heard(self, pca, deviceId, report, now):
+        """Process a report a stick received (runs in the event loop)."""
+        link = self._links.get((deviceId, pca.port))
+        if link is None:
+            link = self._links[(deviceId, pca.port)] = _Link()
+        link.last_heard = now
+        last = self._last_reports.get(deviceId)
+        if last is not None and last[0] == report and now - last[1] < DUPLICATE_WINDOW:
+            # The same frame heard by another stick, only the link is new
+            return
+        self._last_reports[deviceId] = (report, now)
+        owner = self.owner(deviceId) or pca
+        owner._apply_report(deviceId, report, now)
+        # The answer to a command may be heard by another stick than the sender
+        for stick in self._sticks:
+            if stick is not pca and deviceId in stick._waiters:
+                stick._resolve_waiters(deviceId, report)
+
+    def routes(self, deviceId):
+        """Return the sticks to try for a device, best first."""
+        now = time.time()
+        owner = self.owner(deviceId)
+
+        def rank(pca):
+            link = self._links.get((deviceId, pca.port))
+            if link is None or link.last_heard is None:
+                return (1, 0.0, pca is not owner, 0.0)
+            stale = now - link.last_heard > LINK_STALE
+            return (int(stale), -link.reliability, pca is not owner, -link.last_heard)
+
+        return sorted(self._sticks, key=rank)
+
+    def link_info(self, deviceId):
+        """Return what each stick knows about a device (for diagnostics)."""
+        return {
+            port: link.as_dict()
+            for (device, port), link in self._links.items()
+            if device == deviceId
+        }
+
+    def _record(self, pca, deviceId, success):
+        link = self._links.get((deviceId, pca.port))
+        if link is None:
+            link = self._links[(deviceId, pca.port)] = _Link()
+        link.reliability += RELIABILITY_WEIGHT * (float(success) - link.reliability)
+
+    async def _async_route(self, deviceId, send):
+        """Call ``send(pca, channel, share)`` on the best stick, fail over on errors.
+
+        ``share`` is the part of its usual command time each stick gets, so
+        failing over does not multiply the time until an error.
+        """
+        channel = self.channel(deviceId)
+        # A disconnected stick says nothing about reaching the plug
+        routes = [pca for pca in self.routes(deviceId) if pca.is_open]
+        share = 1 / len(routes) if routes else 1
+        error = None
+        for pca in routes:
+            try:
+                result = await send(pca, channel, share)
+            except PCACommandError as e:
+                if pca.is_open:
+                    self._record(pca, deviceId, False)
+                _LOGGER.debug(f"No answer from {deviceId} via {pca.port}: {e}")
+                error = e
+                continue
+            self._record(pca, deviceId, True)
+            return result
+        if error is None:
+            error = PCACommandError(f"No PCA301 stick available for {deviceId}")
+        raise error
+
+    async def async_switch(self, deviceId, value):
+        return await self._async_route(
+            deviceId,
+            lambda pca, channel, share: pca.async_switch(
+                deviceId, value, channel, pca.command_deadline * share
+            ),
+        )
+
+    async def async_status_request(self, deviceId, timeout=None, retries=None):
+        def send(pca, channel, share):
+            tries = (pca.command_retries if retries is None else retries) + 1
+            return pca.async_status_request(
+                deviceId, timeout, max(1, round(tries * share)) - 1, channel
+            )
+
+        return await self._async_route(deviceId, send)
+
+    async def async_poll_status(self, deviceId):
+        return await self._async_route(
+            deviceId,
+            lambda pca, channel, share: pca.async_poll_status(deviceId, channel),
+        )
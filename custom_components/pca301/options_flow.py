@@ -1,8 +1,26 @@
 from homeassistant.config_entries import OptionsFlow
 from homeassistant.const import CONF_DEVICE
 import voluptuous as vol
-import glob
-from .const import DEFAULT_DEVICE
+from . import _loaded_pcas
+from .const import (
+    CONF_CAPTURE_FILE,
+    CONF_HEARTBEAT,
+    CONF_MIN_INTERVAL,
+    CONF_POWER_DEADBAND,
+    CONF_POWER_DEADBAND_PERCENT,
+    CONF_STATS_WINDOWS,
+    DEFAULT_DEVICE,
+    DEFAULT_STATS_WINDOWS,
+)
+from .serial_helper import async_list_pca_ports
+
+# Filter options with their defaults (0 = off)
+FILTER_OPTIONS = (
+    CONF_POWER_DEADBAND,
+    CONF_POWER_DEADBAND_PERCENT,
+    CONF_MIN_INTERVAL,
+    CONF_HEARTBEAT,
+)
 
 
 class PCA301OptionsFlowHandler(OptionsFlow):
@@ -12,26 +30,53 @@ class PCA301OptionsFlowHandler(OptionsFlow):
         """Manage the options for the serial device."""
         hass = self.hass
         errors = {}
-        usb_ports = await hass.async_add_executor_job(glob.glob, "/dev/ttyUSB*")
-        acm_ports = await hass.async_add_executor_job(glob.glob, "/dev/ttyACM*")
-        serial_ports = usb_ports + acm_ports
-        port_options = serial_ports if serial_ports else [DEFAULT_DEVICE]
         # Erst in options, dann in data, dann default
         current_device = self.config_entry.options.get(
             CONF_DEVICE,
             self.config_entry.data.get(CONF_DEVICE, DEFAULT_DEVICE)
         )
+        port_options = await async_list_pca_ports(
+            hass, [pca.port for pca in _loaded_pcas(hass)]
+        )
+        if current_device not in port_options:
+            port_options.insert(0, current_device)
 
         if user_input is not None:
+            # Keep the channel map and other stored options
+            options = dict(self.config_entry.options)
+            for key in FILTER_OPTIONS:
+                options[key] = user_input[key]
+            # Take effect when the entry is loaded next time
+            options[CONF_CAPTURE_FILE] = user_input[CONF_CAPTURE_FILE]
+            options[CONF_STATS_WINDOWS] = user_input[CONF_STATS_WINDOWS]
             # Only update if device changed
             if user_input[CONF_DEVICE] != current_device:
-                return self.async_create_entry(data={CONF_DEVICE: user_input[CONF_DEVICE]})
-            return self.async_create_entry(data={})
+                options[CONF_DEVICE] = user_input[CONF_DEVICE]
+            return self.async_create_entry(data=options)
 
+        schema = {
+            vol.Required(CONF_DEVICE, default=current_device): vol.In(port_options)
+        }
+        for key in FILTER_OPTIONS:
+            schema[
+                vol.Optional(key, default=self.config_entry.options.get(key, 0))
+            ] = vol.All(vol.Coerce(float), vol.Range(min=0))
+        schema[
+            vol.Optional(
+                CONF_CAPTURE_FILE,
+                default=self.config_entry.options.get(CONF_CAPTURE_FILE, False),
+            )
+        ] = bool
+        schema[
+            vol.Optional(
+                CONF_STATS_WINDOWS,
+                default=self.config_entry.options.get(
+                    CONF_STATS_WINDOWS, DEFAULT_STATS_WINDOWS
+                ),
+            )
+        ] = str
         return self.async_show_form(
             step_id="init",
-            data_schema=vol.Schema({
-                vol.Required(CONF_DEVICE, default=current_device): vol.In(port_options)
-            }),
+            data_schema=vol.Schema(schema),
             errors=errors,
         )
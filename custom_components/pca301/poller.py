@@ -0,0 +1,98 @@
+"""Background status polling of PCA301 plugs.
+
+PCA301 plugs only report when asked. The poller round-robins status
+requests across the known plugs, asks busy plugs more often and backs
+off idle or unreachable ones. Polls are queued with a lower priority
+than user commands and paused while no stick is connected.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+POLL_FAST = 30  # s, plugs with high or changing power draw
+POLL_NORMAL = 120  # s
+POLL_MAX = 900  # s, upper limit of the back-off for idle/unreachable plugs
+HIGH_DRAW = 50.0  # W
+POWER_CHANGE = 1.0  # W, difference counted as "changing"
+IDLE_WAIT = 5  # s, sleep when there is nothing to poll
+
+
+class StatusPoller:
+    """Schedule status requests for the known devices of one PCA."""
+
+    def __init__(self, pca):
+        self._pca = pca
+        self._queue = []  # heap of (due, deviceId)
+        self._scheduled = set()
+        self._intervals = {}  # deviceId: current poll interval
+        self._last_power = {}
+
+    async def async_run(self):
+        """Poll forever, one status request in flight at a time."""
+        while True:
+            self._schedule_new_devices()
+            if not self._pca.connected:
+                # Nothing can be polled without a stick, wait until it is back
+                await asyncio.sleep(IDLE_WAIT)
+                continue
+            if not self._queue:
+                await asyncio.sleep(IDLE_WAIT)
+                continue
+            due, deviceId = self._queue[0]
+            delay = due - time.time()
+            if delay > 0:
+                await asyncio.sleep(min(delay, IDLE_WAIT))
+                continue
+            heapq.heappop(self._queue)
+            self._scheduled.discard(deviceId)
+            if deviceId not in self._pca.known_devices:
+                self._intervals.pop(deviceId, None)
+                self._last_power.pop(deviceId, None)
+                continue
+            self._schedule(deviceId, await self._async_poll(deviceId))
+
+    async def _async_poll(self, deviceId):
+        """Poll a device if needed, return the interval until the next poll."""
+        interval = self._intervals.get(deviceId, POLL_NORMAL)
+        device = self._pca.get_device(deviceId)
+        if device.last_updated is not None:
+            age = time.time() - device.last_updated
+            if age < interval:
+                # Reported on its own (e.g. after a command), no need to ask
+                return interval - age
+        try:
+            await self._pca.async_poll_status(deviceId)
+        except Exception as e:
+            _LOGGER.debug(f"Status poll of {deviceId} failed: {e}")
+            if not self._pca.connected:
+                # The stick was lost, not the plug: ask again once it is back
+                return IDLE_WAIT
+            interval = min(interval * 2, POLL_MAX)
+        else:
+            interval = self._next_interval(deviceId, device, interval)
+        self._intervals[deviceId] = interval
+        return interval
+
+    def _next_interval(self, deviceId, device, interval):
+        power = device.power or 0.0
+        last_power = self._last_power.get(deviceId)
+        self._last_power[deviceId] = power
+        changing = last_power is not None and abs(power - last_power) >= POWER_CHANGE
+        if power >= HIGH_DRAW or changing:
+            return POLL_FAST
+        if not power:
+            # Idle plug, back off
+            return min(max(interval, POLL_NORMAL) * 2, POLL_MAX)
+        return POLL_NORMAL
+
+    def _schedule(self, deviceId, delay):
+        heapq.heappush(self._queue, (time.time() + delay, deviceId))
+        self._scheduled.add(deviceId)
+
+    def _schedule_new_devices(self):
+        for deviceId in self._pca.known_devices.keys() - self._scheduled:
+            self._schedule(deviceId, 0)
@@ -0,0 +1,136 @@
+"""Wire protocol helpers for the PCA301 JeeLink firmware.
+
+Nothing in here depends on Home Assistant, so the helpers can be used by
+the benchmarks and tools as well.
+"""
+
+from typing import NamedTuple
+
+REPORT_TOKEN = b"OK 24"
+REPORT_PREFIX = REPORT_TOKEN + b" "
+
+SEND_SUFFIX = "s"
+
+# Asks the firmware for its version banner, e.g. "[pcaSerial.1.0]"
+VERSION_COMMAND = b"v"
+FIRMWARE_BANNER = b"[pcaSerial"
+
+CMD_MEASURE = 4
+CMD_SWITCH = 5
+
+# Power bytes of a report without measurement (e.g. pairing), 0xAA 0xAA
+NO_MEASUREMENT = 0xAAAA
+
+
+class Report(NamedTuple):
+    """Decoded ``OK 24`` report frame."""
+
+    device: int  # 24 bit plug address
+    channel: int
+    command: int
+    state: int
+    power: float  # W
+    consumption: float  # kWh
+    raw_power: int
+
+
+_new_report = Report.__new__
+_device_ids = {}
+
+
+def decode_report(line):
+    """Decode a raw ``OK 24`` line, return None for anything else."""
+    if line[:6] != REPORT_PREFIX:
+        return None
+    try:
+        chan, cmd, a1, a2, a3, state, p1, p2, c1, c2 = map(int, line[6:].split())
+    except ValueError:
+        return None
+    raw_power = p1 << 8 | p2
+    return _new_report(
+        Report,
+        a1 << 16 | a2 << 8 | a3,
+        chan,
+        cmd,
+        state,
+        raw_power / 10.0,
+        (c1 << 8 | c2) / 100.0,
+        raw_power,
+    )
+
+
+def encode_command(channel, command, device, value=0):
+    """Return the bytes sending a command to a plug (``...s`` syntax)."""
+    return (
+        f"{channel},{command},{device >> 16},{device >> 8 & 0xFF},{device & 0xFF},"
+        f"{value},255,255,255,255{SEND_SUFFIX}"
+    ).encode("ascii")
+
+
+def format_device_id(device):
+    """Return the 9 digit device id string used in the registries."""
+    device_id = _device_ids.get(device)
+    if device_id is None:
+        device_id = _device_ids[device] = (
+            f"{device >> 16:03d}{device >> 8 & 0xFF:03d}{device & 0xFF:03d}"
+        )
+    return device_id
+
+
+def parse_device_id(device_id):
+    """Return the 24 bit address of a 9 digit device id string."""
+    return int(device_id[0:3]) << 16 | int(device_id[3:6]) << 8 | int(device_id[6:9])
+
+
+class FrameSplitter:
+    """Split the byte stream received from the stick into lines.
+
+    Bytes are collected in one reusable buffer and complete lines are cut
+    out of it in place. Garbage in front of an ``OK 24`` token and reports
+    truncated by the next one are dropped and counted in ``dropped_bytes``.
+    """
+
+    __slots__ = ("_buffer", "_max_pending", "dropped_bytes")
+
+    def __init__(self, max_pending=1024):
+        self._buffer = bytearray()
+        self._max_pending = max_pending
+        self.dropped_bytes = 0
+
+    def clear(self):
+        """Forget any incomplete line, e.g. after reopening the port."""
+        self.dropped_bytes += len(self._buffer)
+        self._buffer.clear()
+
+    def feed(self, data):
+        """Append received bytes and return the complete lines."""
+        buffer = self._buffer
+        buffer += data
+        lines = []
+        start = 0
+        while (end := buffer.find(b"\n", start)) >= 0:
+            line = self._resync(buffer, start, end)
+            if line:
+                lines.append(line)
+            start = end + 1
+        if start:
+            del buffer[:start]
+        if len(buffer) > self._max_pending:
+            # No line end for too long: keep the buffer from the last report token
+            sync = buffer.rfind(REPORT_TOKEN, 1)
+            drop = sync if sync > 0 else len(buffer)
+            self.dropped_bytes += drop
+            del buffer[:drop]
+        return lines
+
+    def _resync(self, buffer, start, end):
+        if end > start and buffer[end - 1] == 0x0D:
+            end -= 1
+        sync = buffer.find(REPORT_TOKEN, start, end)
+        if sync < 0:
+            # Not a report (firmware banner, pairing list, noise)
+            return bytes(buffer[start:end])
+        # Only the last report token of a line can start a complete frame
+        sync = buffer.rfind(REPORT_TOKEN, sync, end)
+        self.dropped_bytes += sync - start
+        return bytes(buffer[sync:end])
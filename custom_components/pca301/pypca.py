@@ -6,69 +6,298 @@ including device discovery, state updates, and integration with Home Assistant r
 
 import asyncio
 import contextlib
+import itertools
 import logging
+import random
 import re
-import threading
 import time
 from pathlib import Path
 
 import serial
-from homeassistant.helpers import entity_registry as er, device_registry as dr
-
-SEND_SUFFIX = "s"
+import serial_asyncio_fast
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+
+from .capture import RX, TX
+from .const import SIGNAL_NEW_DEVICES, STATS_UNIQUE_ID_MARKER
+from .device_state import VALUES, DeviceState, parse_channel
+from .protocol import (
+    CMD_MEASURE,
+    CMD_SWITCH,
+    FIRMWARE_BANNER,
+    NO_MEASUREMENT,
+    REPORT_TOKEN,
+    VERSION_COMMAND,
+    FrameSplitter,
+    decode_report,
+    encode_command,
+    format_device_id,
+    parse_device_id,
+)
+from .poller import StatusPoller
+from .registry_index import RegistryIndex
+from .stats import PCAStats
+
+COMMAND_TIMEOUT = 2.0
+COMMAND_RETRIES = 2
+# Time a switch command is retried (with jittered exponential back-off)
+COMMAND_DEADLINE = 10.0
+# Air time of one command frame at 6.6 kbit/s plus turnaround in the stick
+RADIO_FRAME_TIME = 0.03
+# Time to wait for the firmware banner after opening the port
+HANDSHAKE_TIMEOUT = 3.0
+# Delay between attempts to (re)open the port, doubled up to the maximum
+RECONNECT_DELAY = 5.0
+RECONNECT_DELAY_MAX = 60.0
+# s, restored values keep the entities available this long while connecting
+RESTORED_GRACE = 30.0
+# Send queue priorities, lower values are sent first
+PRIORITY_USER = 0
+PRIORITY_POLL = 1
 
 _LOGGER = logging.getLogger(__name__)
 home = str(Path.home())
 
 
+class PCACommandError(Exception):
+    """A command was not acknowledged by the plug."""
+
+
+class _SwitchJob:
+    """Wanted state of a device that is being switched."""
+
+    __slots__ = ("value", "changed", "future")
+
+    def __init__(self, value, future):
+        self.value = value
+        self.changed = asyncio.Event()
+        self.future = future
+
+
+class PCAProtocol(asyncio.Protocol):
+    """Event-loop side of the serial connection to the PCA301 stick."""
+
+    def __init__(self, pca):
+        self._pca = pca
+
+    def connection_made(self, transport):
+        self._pca._connection_made(transport)
+
+    def data_received(self, data):
+        self._pca._data_received(data)
+
+    def connection_lost(self, exc):
+        self._pca._connection_lost(exc)
+
+
 class PCA:
     _hass = None
-    _serial = None
-    _stopevent = None
-    _thread = None
-    _re_reading = re.compile(
-        r"OK 24 (\d+) 4 (\d+) (\d+) (\d+) (\d+) (\d+) (\d+) (\d+) (\d+)"
-    )
+    _transport = None
     _re_devices = re.compile(
         r"L 24 (\d+) (\d+) : (\d+) 4 (\d+) (\d+) (\d+) (\d+) (\d+) (\d+) (\d+) (\d+)"
     )
 
-    def __init__(self, hass, port, timeout=2):
-        self._devices = {}
+    def __init__(
+        self,
+        hass,
+        port,
+        timeout=2,
+        command_timeout=COMMAND_TIMEOUT,
+        command_retries=COMMAND_RETRIES,
+        command_deadline=COMMAND_DEADLINE,
+        status_polling=True,
+        hub=None,
+        entry_id=None,
+    ):
+        self._devices = {}  # deviceId: DeviceState, only touched by the PCA
+        # deviceId: DeviceSnapshot published for readers, oldest change first
+        self._snapshots = {}
+        self._version = 0  # bumped with every published snapshot
         self._hass = hass
         self._port = port
         self._baud = 57600
         self._timeout = timeout
-        self._serial = serial.Serial(timeout=timeout)
         self._known_devices = {}  # deviceId: channel
-        self._serial_lock = threading.Lock()  # Lock für serielle Schnittstelle
+        self._reported = set()  # deviceIds with at least one report since open
+        self._ready = asyncio.Event()
+        self._framer = FrameSplitter()
+        self._registry_index = None
+        self._enabled_devices = set()  # deviceIds whose entities were enabled
+        self._waiters = {}  # deviceId: [(future, check)] waiting for a report
+        # (priority, seq, cmd, sent future) to put on air
+        self._send_queue = asyncio.PriorityQueue()
+        self._send_seq = itertools.count()
+        self._sender = None
+        self._status_polling = status_polling
+        self._poller = None
+        self.command_timeout = command_timeout
+        self.command_retries = command_retries
+        self.command_deadline = command_deadline
+        self._switch_jobs = {}  # deviceId: _SwitchJob
+        self.stats = PCAStats()
+        # PCAHub routing commands across sticks, None for a single stick
+        self._hub = hub
+        # Config entry whose platforms add entities for new devices
+        self._entry_id = entry_id
+        self._scan_ids = None  # list of new deviceIds while scanning
+        self._scan_found = asyncio.Event()
+        self._connector = None
+        self._disconnected = asyncio.Event()
+        self._was_ready = False
+        # Restored values count as available, until the first failed open
+        # or RESTORED_GRACE after the start
+        self._restored_grace = False
+        self._grace_timer = None
+        # DeviceStateStore persisting the values, set up by the integration
+        self.state_store = None
+        # WriteFilter thinning out entity updates, None writes every change
+        self.write_filter = None
+        # PCACoordinator fanning out updates to the entities of the entry
+        self.coordinator = None
+        # RollingStats of the power per device, None if disabled
+        self.rolling = None
+        # FrameCapture recording the raw traffic, None if disabled
+        self.capture = None
+        # deviceId: names of the values to push, flushed once per loop tick
+        self._pending_updates = {}
+        self._flush_scheduled = False
 
     async def async_load_known_devices(self, hass):
         # No-op: Devices will be loaded from the Home Assistant device registry or entry.options.
         pass
 
-    def open(self):
+    async def async_open(self):
+        """Open the serial connection in the event loop and start receiving.
+
+        Returns once the firmware answered the handshake (or after
+        HANDSHAKE_TIMEOUT), raises serial.SerialException if the port
+        cannot be opened.
+        """
         _LOGGER.info(f"Opening serial port {self._port}")
+        if self._transport is not None:
+            _LOGGER.warning(f"Serial port {self._port} already open, closing first.")
+            self._transport.close()
+            self._transport = None
+        self._ready.clear()
+        self._disconnected.clear()
+        self._framer.clear()
         try:
-            if self._serial.is_open:
-                _LOGGER.warning(
-                    f"Serial port {self._port} already open, closing first."
-                )
-                self._serial.close()
-            self._serial.port = self._port
-            self._serial.baudrate = self._baud
-            self._serial.timeout = self._timeout
-            self._serial.open()
-            # self._serial.flushInput()
-            # self._serial.flushOutput()
-            self.get_ready()
-            _LOGGER.info(f"Serial port {self._port} opened and ready.")
-            self._start_worker()
+            transport, _ = await serial_asyncio_fast.create_serial_connection(
+                self._hass.loop,
+                lambda: PCAProtocol(self),
+                self._port,
+                baudrate=self._baud,
+            )
         except serial.SerialException as e:
             _LOGGER.error(f"Error opening serial port {self._port}: {e}")
-            with contextlib.suppress(Exception):
-                self._serial.close()
             raise
+        # connection_made() only follows with the next loop iteration, the
+        # handshake below must not wait for it
+        self._transport = transport
+        if self._sender is None:
+            self._sender = self._hass.async_create_background_task(
+                self._async_sender(), f"pca301 sender {self._port}"
+            )
+        if self._status_polling and self._poller is None:
+            self._poller = self._hass.async_create_background_task(
+                StatusPoller(self).async_run(), f"pca301 poller {self._port}"
+            )
+        # Handshake: the firmware answers "v" with its version banner
+        self._write_cmd(VERSION_COMMAND)
+        if await self.async_get_ready(HANDSHAKE_TIMEOUT):
+            _LOGGER.info(f"Serial port {self._port} opened and ready.")
+        else:
+            _LOGGER.warning(
+                f"No answer from the firmware on {self._port}, waiting for reports"
+            )
+
+    def open(self):
+        """Open the serial connection from a worker thread."""
+        asyncio.run_coroutine_threadsafe(self.async_open(), self._hass.loop).result()
+
+    def async_start(self):
+        """Connect in the background and reconnect whenever the port is lost.
+
+        Returns at once, ``available`` tells when the stick is ready.
+        """
+        if self._restored_grace and self._grace_timer is None:
+            self._grace_timer = self._hass.loop.call_later(
+                RESTORED_GRACE, self._end_restored_grace
+            )
+        if self._connector is None:
+            self._connector = self._hass.async_create_background_task(
+                self._async_keep_connected(), f"pca301 connection {self._port}"
+            )
+
+    async def _async_keep_connected(self):
+        delay = RECONNECT_DELAY
+        while True:
+            try:
+                await self.async_open()
+            except (serial.SerialException, OSError):
+                _LOGGER.info(f"Retrying to open {self._port} in {delay:.0f}s")
+                self._end_restored_grace()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, RECONNECT_DELAY_MAX)
+                continue
+            delay = RECONNECT_DELAY
+            await self._disconnected.wait()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    @property
+    def ready(self):
+        """Return True if this stick is connected and answered."""
+        return self._transport is not None and self._ready.is_set()
+
+    @property
+    def is_open(self):
+        """Return True if the serial port is open and commands can be sent.
+
+        Unlike ``ready`` this does not wait for the handshake: firmware
+        without banner only proves itself with the answer to a command.
+        """
+        return self._transport is not None
+
+    @property
+    def connected(self):
+        """Return True if a stick that can reach the plugs has its port open."""
+        sticks = self._hub.sticks if self._hub is not None else [self]
+        return any(stick.is_open for stick in sticks)
+
+    @property
+    def available(self):
+        """Return True if a stick that can reach the plugs is ready.
+
+        Restored values count as available while connecting for the first
+        time, unless the port cannot be opened or RESTORED_GRACE passed.
+        """
+        if self._restored_grace and not self._was_ready:
+            return True
+        if self._hub is not None:
+            return any(stick.ready for stick in self._hub.sticks)
+        return self.ready
+
+    def _notify_connection(self):
+        """Tell the entities that the availability may have changed."""
+        # With a hub, the availability of all entries depends on every stick
+        sticks = self._hub.sticks if self._hub is not None else [self]
+        for stick in sticks:
+            if stick.coordinator is not None:
+                stick.coordinator.async_connection_changed()
+
+    def _end_restored_grace(self):
+        """Let the availability follow the stick from now on."""
+        if self._grace_timer is not None:
+            self._grace_timer.cancel()
+            self._grace_timer = None
+        if self._restored_grace:
+            self._restored_grace = False
+            self._notify_connection()
+
+    def _set_ready(self):
+        self._ready.set()
+        self._was_ready = True
+        self._notify_connection()
 
     @property
     def known_devices(self):
@@ -81,355 +310,563 @@ class PCA:
 
     def close(self):
         _LOGGER.info(f"Closing serial port {self._port}")
-        self._stop_worker()
-        try:
-            if self._serial.is_open:
-                self._serial.close()
-                _LOGGER.info(f"Serial port {self._port} closed.")
-        except Exception as e:
-            _LOGGER.warning(f"Error closing serial port {self._port}: {e}")
+        if self._connector is not None:
+            self._hass.loop.call_soon_threadsafe(self._connector.cancel)
+            self._connector = None
+        if self._grace_timer is not None:
+            self._hass.loop.call_soon_threadsafe(self._grace_timer.cancel)
+            self._grace_timer = None
+        if self._registry_index is not None:
+            self._hass.loop.call_soon_threadsafe(self._registry_index.async_stop)
+            self._registry_index = None
+        if self._poller is not None:
+            self._hass.loop.call_soon_threadsafe(self._poller.cancel)
+            self._poller = None
+        if self._sender is not None:
+            self._hass.loop.call_soon_threadsafe(self._sender.cancel)
+            self._sender = None
+        if self._transport is not None:
+            # Thread-safe, close() is also called from the executor on shutdown
+            self._hass.loop.call_soon_threadsafe(self._transport.close)
+            self._transport = None
+
+    @property
+    def port(self):
+        """Return the serial port of the stick."""
+        return self._port
+
+    @property
+    def bytes_discarded(self):
+        """Return the number of received bytes dropped while framing."""
+        return self._framer.dropped_bytes
+
+    def get_stats(self):
+        """Return the runtime counters of the connection."""
+        return self.stats.as_dict(self.bytes_discarded)
 
     def reset_devices(self):
         """Leere die interne Geräteliste."""
         self._devices = {}
+        self._snapshots = {}
+
+    async def async_get_ready(self, timeout=2):
+        """Wait until the stick sent its banner or a report, False on timeout."""
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        return self._ready.is_set()
+
+    def _connection_made(self, transport):
+        self._transport = transport
+
+    def _data_received(self, data):
+        lines = self._framer.feed(data)
+        self.stats.frames_received += len(lines)
+        capture = self.capture
+        for line in lines:
+            if capture is not None:
+                capture.record(RX, line)
+            try:
+                self._handle_line(line)
+            except Exception as e:
+                _LOGGER.error(f"Unexpected exception while handling line: {e}")
 
-    def get_ready(self):
-        try:
-            line = self._serial.readline().decode("utf-8")
-            start = time.time()
-            timeout = 2
-            while (
-                self._re_reading.match(line) is None and time.time() - start < timeout
-            ):
-                line = self._serial.readline().decode("utf-8")
-            return True
-        except serial.SerialException as e:
-            _LOGGER.error(f"Error reading from serial port: {e}")
-            with contextlib.suppress(Exception):
-                self._serial.close()
-            raise
+    def replay_line(self, line):
+        """Handle a line of a capture file as if the stick had sent it."""
+        self.stats.frames_received += 1
+        self._handle_line(line)
+
+    def _connection_lost(self, exc):
+        if exc is not None:
+            _LOGGER.warning(f"Serial connection to {self._port} lost: {exc}")
+        self._transport = None
+        self._ready.clear()
+        self._disconnected.set()
+        self._notify_connection()
 
     def get_devices(self):
-        """Gibt die aktuelle Geräteliste zurück (ohne Scan)."""
-        # Wenn _devices leer ist, aus _known_devices bauen
-        if not self._devices and self._known_devices:
-            for device, channel in self._known_devices.items():
-                self._devices[device] = {
-                    "state": 0,
-                    "consumption": 0,
-                    "power": 0,
-                    "channel": channel,
-                }
-        return self._devices
+        """Gibt die aktuelle Geräteliste zurück (ohne Scan).
+
+        Maps the device ids to immutable DeviceSnapshots, later reports do
+        not change the returned values.
+        """
+        for device in self._known_devices:
+            self.get_device(device)
+        return dict(self._snapshots)
+
+    def get_device(self, deviceId):
+        """Return the state record of a device, created on first use."""
+        device = self._devices.get(deviceId)
+        if device is None:
+            device = self._devices[deviceId] = DeviceState(
+                parse_channel(self._known_devices.get(deviceId))
+            )
+            self._publish(deviceId, device)
+        return device
+
+    def _publish(self, deviceId, device):
+        """Replace the snapshot of a device after its values changed."""
+        self._version = device.version = self._version + 1
+        snapshots = self._snapshots
+        # Re-insert so the snapshots stay ordered by version
+        snapshots.pop(deviceId, None)
+        snapshots[deviceId] = device.snapshot()
+
+    @property
+    def version(self):
+        """Return the version of the latest published snapshot."""
+        return self._version
+
+    def changes_since(self, version):
+        """Return the current version and the snapshots newer than ``version``.
+
+        Only the changed devices are visited, so polling this with the
+        version of the previous call is cheap.
+        """
+        changed = {}
+        snapshots = self._snapshots
+        for deviceId in reversed(snapshots):
+            snapshot = snapshots[deviceId]
+            if snapshot.version <= version:
+                break
+            changed[deviceId] = snapshot
+        return self._version, changed
+
+    def restore_device(self, deviceId, state, power, consumption, last_updated):
+        """Seed a device with the values saved before a restart."""
+        device = self.get_device(deviceId)
+        device.restore(state, power, consumption, last_updated)
+        self._publish(deviceId, device)
+        self._restored_grace = True
 
     def get_current_power(self, deviceId):
-        return self._devices[deviceId]["power"]
+        return self._snapshots[deviceId].power
 
     def get_total_consumption(self, deviceId):
-        return self._devices[deviceId]["consumption"]
+        return self._snapshots[deviceId].consumption
 
     def get_state(self, deviceId):
         # Return None if device or state is missing to avoid KeyError
-        device = self._devices.get(deviceId)
-        if device is None:
+        snapshot = self._snapshots.get(deviceId)
+        if snapshot is None:
             return None
-        return device.get("state")
+        return snapshot.state
 
-    def _stop_worker(self):
-        if self._stopevent is not None:
-            self._stopevent.set()
-        if self._thread is not None:
-            self._thread.join()
+    def get_snapshot(self, deviceId):
+        """Return the immutable DeviceSnapshot of a device, or None."""
+        return self._snapshots.get(deviceId)
 
-    def start_scan(self, fast=0):
-        """Starte das Scannen nach neuen Geräten (Discovery). Gibt Liste neuer Geräte-IDs zurück."""
+    async def async_start_scan(self, fast=0):
+        """Watch for new devices on the open connection, return their ids.
+
+        Reports and commands of the known devices are processed as usual
+        meanwhile. Waits up to 30 s (5 s if ``fast``) for the first new
+        device and after each one 15 s (5 s) for another.
+        """
         _LOGGER.info("Please press the button on your PCA")
-        self._stop_worker()
-        # Warten, bis der Hintergrund-Thread wirklich beendet ist
-        if self._thread is not None:
-            self._thread.join(timeout=2)
-        time.sleep(0.5)
-
-        # Lock für exklusiven Zugriff während des Scannens
-        with self._serial_lock:
-            # Ensure serial port is open
-            if not self._serial.is_open:
-                try:
-                    _LOGGER.info(f"Opening serial port for scanning {self._port}")
-                    self._serial.port = self._port
-                    self._serial.baudrate = self._baud
-                    self._serial.timeout = self._timeout
-                    self._serial.open()
-                except Exception as e:
-                    _LOGGER.error(f"Could not open serial port {self._port}: {e}")
-                    return []
-
-            # Flush Input/Output Buffer
-            try:
-                self._serial.reset_input_buffer()
-                self._serial.reset_output_buffer()
-            except Exception as e:
-                _LOGGER.warning(f"Could not flush buffers: {e}")
-
-            start = int(time.time())
-            found = False
-            DISCOVERY_TIME = 5 if fast else 15
-            DISCOVERY_TIMEOUT = 5 if fast else 30
-            _LOGGER.debug(
-                "Known devices before scan: %s", list(self._known_devices.keys())
-            )
-            _LOGGER.debug("Devices before scan: %s", list(self._devices.keys()))
-
-            # Vorhandene Geräte initialisieren
-            for device, channel in self._known_devices.items():
-                self._devices[device] = {}
-                self._devices[device]["state"] = 0
-                self._devices[device]["consumption"] = 0
-                self._devices[device]["power"] = 0
-                self._devices[device]["channel"] = channel
-            new_device_ids = []
-            while not (int(time.time()) - start > DISCOVERY_TIMEOUT) or not (
-                int(time.time()) - start > DISCOVERY_TIME or found
-            ):
+        if self._scan_ids is not None:
+            raise PCACommandError(f"Scan already running on {self._port}")
+        discovery_time = 5 if fast else 15
+        discovery_timeout = 5 if fast else 30
+        _LOGGER.debug("Known devices before scan: %s", list(self._known_devices.keys()))
+        loop = self._hass.loop
+        new_device_ids = self._scan_ids = []
+        deadline = loop.time() + discovery_timeout
+        try:
+            while (remaining := deadline - loop.time()) > 0:
+                self._scan_found.clear()
                 try:
-                    raw_line = self._serial.readline().decode("utf-8")
-                except serial.SerialException as e:
-                    _LOGGER.error(f"Serial error during scan: {e}")
-                    # Kurze Pause und weitermachen
-                    time.sleep(0.1)
-                    continue
-                except Exception as e:
-                    _LOGGER.error(f"Error reading from serial port: {e}")
-                    continue
-
-                # Prüfen, ob Zeile leer ist (häufig bei "multiple access")
-                if not raw_line or len(raw_line.strip()) < 2:
-                    continue
-
-                line_stripped = raw_line.strip()
-                if len(line_stripped) < 2:
-                    continue
-                line_stripped = raw_line.strip()
-                if len(line_stripped) < 2:
-                    continue
-                _LOGGER.debug(f"Received line: {line_stripped}")
-                line = line_stripped.split(" ")
-                _LOGGER.debug(f"Parsed line: {line}")
+                    await asyncio.wait_for(self._scan_found.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                deadline = loop.time() + discovery_time
+        finally:
+            self._scan_ids = None
+        _LOGGER.info(f"Devices found: {new_device_ids}")
+        return new_device_ids
 
-                if len(line) > 12:
-                    while line[0] != "OK" and len(line) >= 12:
-                        line.pop(0)
-                        continue
+    def start_scan(self, fast=0):
+        """Starte das Scannen nach neuen Geräten (Discovery) aus einem Worker-Thread."""
+        return asyncio.run_coroutine_threadsafe(
+            self.async_start_scan(fast), self._hass.loop
+        ).result()
+
+    def _scan_report(self, deviceId, report):
+        """Take over a device not known yet while scanning."""
+        if deviceId in self._known_devices or (
+            self._hub is not None and self._hub.owner(deviceId) is not None
+        ):
+            return
+        channel = report.channel
+        _LOGGER.info(f"New device found: {deviceId} (channel {channel})")
+        self._known_devices[deviceId] = channel
+        self._scan_ids.append(deviceId)
+        self._scan_found.set()
+        if self._entry_id is not None:
+            # The platforms add the entities of this device alone, right away
+            async_dispatcher_send(
+                self._hass, SIGNAL_NEW_DEVICES.format(self._entry_id), [deviceId]
+            )
 
-                if len(line) < 12:
-                    _LOGGER.warning(f"Malformed device response (too short): {line}")
-                    continue
+    def _write_cmd(self, cmd):
+        """Write raw command bytes (runs in the event loop)."""
+        _LOGGER.debug("Sending command to PCA301: %r", cmd)
+        transport = self._transport
+        if transport is None:
+            _LOGGER.error(f"Error sending command: serial port {self._port} not open")
+            return False
+        if self.capture is not None:
+            self.capture.record(TX, cmd)
+        # Writes are buffered by the transport and never wait for the reader
+        transport.write(cmd)
+        return True
 
-                try:
-                    if line[8] != "170" or line[9] != "170":
-                        deviceId = (
-                            str(line[4]).zfill(3)
-                            + str(line[5]).zfill(3)
-                            + str(line[6]).zfill(3)
-                        )
-                        channel = line[
-                            2
-                        ]  # Channel ist an Position 2 laut PCA301 Protokoll
-                        self._devices[deviceId] = {}
-                        self._devices[deviceId]["power"] = (
-                            int(line[8]) * 256 + int(line[9])
-                        ) / 10.0
-                        self._devices[deviceId]["state"] = int(line[7])
-                        self._devices[deviceId]["consumption"] = (
-                            int(line[10]) * 256 + int(line[11])
-                        ) / 100.0
-                        self._devices[deviceId]["channel"] = channel
-                        if deviceId in self._known_devices:
-                            _LOGGER.info(
-                                f"Skip device with ID {deviceId}, because it's already known."
-                            )
-                        else:
-                            _LOGGER.info(
-                                f"New device found: {deviceId} (channel {channel}), will wait for another device for {DISCOVERY_TIME} seconds..."
-                            )
-                            self._known_devices[deviceId] = channel
-                            new_device_ids.append(deviceId)
-                            found = True
-                            start = time.time()
-                except Exception as e:
-                    _LOGGER.warning(f"Error parsing device response: {line} - {e}")
+    async def _async_sender(self):
+        """Put queued commands on air back to back, paced by the radio frame time."""
+        queue = self._send_queue
+        try:
+            while True:
+                _, _, cmd, queued, sent = await queue.get()
+                if sent.done():
+                    # The caller gave up already
                     continue
+                if self._write_cmd(cmd):
+                    self.stats.add_queue_wait(self._hass.loop.time() - queued)
+                    sent.set_result(None)
+                else:
+                    sent.set_exception(
+                        PCACommandError(f"Serial port {self._port} not open")
+                    )
+                await asyncio.sleep(RADIO_FRAME_TIME)
+        finally:
+            while not queue.empty():
+                sent = queue.get_nowait()[-1]
+                if not sent.done():
+                    sent.set_exception(
+                        PCACommandError(f"Serial port {self._port} closed")
+                    )
 
-        _LOGGER.info(f"Devices found: {list(self._devices.keys())}")
-        self._start_worker()
-        return new_device_ids
-
-    def _write_cmd(self, cmd):
-        _LOGGER.debug(f"Sending command to PCA301: {cmd}")
-        with self._serial_lock:
+    async def _async_transmit(self, cmd, priority=PRIORITY_USER):
+        """Queue a command and wait until it was written to the stick."""
+        if self._sender is None:
+            raise PCACommandError(f"Serial port {self._port} not open")
+        sent = self._hass.loop.create_future()
+        self._send_queue.put_nowait(
+            (priority, next(self._send_seq), cmd, self._hass.loop.time(), sent)
+        )
+        await sent
+
+    async def async_send_command(
+        self,
+        deviceId,
+        command,
+        value=0,
+        check=None,
+        timeout=None,
+        retries=None,
+        priority=PRIORITY_USER,
+        channel=None,
+    ):
+        """Send a command and return the report the device answers with.
+
+        The command is repeated if no report (passing ``check``) arrives
+        within ``timeout`` seconds; PCACommandError is raised after the
+        last retry. Commands with a lower ``priority`` value are sent first.
+        ``channel`` overrides the channel map, for plugs scanned by another
+        stick.
+        """
+        timeout = self.command_timeout if timeout is None else timeout
+        retries = self.command_retries if retries is None else retries
+        # deviceId ist ein 9-stelliger String, z.B. '009088163'
+        if channel is None:
+            channel = parse_channel(self._known_devices.get(deviceId, "01"))
+        cmd = encode_command(channel, command, parse_device_id(deviceId), value)
+        stats = self.stats
+        loop = self._hass.loop
+        for attempt in range(retries + 1):
+            if attempt:
+                stats.retries += 1
+            future = loop.create_future()
+            waiter = (future, check)
+            self._waiters.setdefault(deviceId, []).append(waiter)
             try:
-                # Konvertiere die Bytes zu einem String mit Leerzeichen-Trennung, nur 's' als Suffix (kein Newline)
-                cmd_str = ",".join(str(b) for b in cmd) + "s"
-                _LOGGER.debug(f"Command string to send: {repr(cmd_str)}")
-                self._serial.write(cmd_str.encode("ascii"))
-                _LOGGER.debug(f"Command sent successfully")
-            except Exception as e:
-                _LOGGER.error(f"Error sending command: {e}")
-                return
-
-    def _start_worker(self):
-        if self._thread is not None:
-            return
-        self._stopevent = threading.Event()
-        self._thread = threading.Thread(target=self._refresh, args=())
-        self._thread.daemon = True
-        self._thread.start()
+                await self._async_transmit(cmd, priority)
+                sent = loop.time()
+                report = await asyncio.wait_for(future, timeout)
+                stats.add_rtt(loop.time() - sent)
+                return report
+            except asyncio.TimeoutError:
+                stats.timeouts += 1
+                _LOGGER.debug(
+                    f"No answer from {deviceId} to {cmd!r} (attempt {attempt + 1})"
+                )
+            finally:
+                waiters = self._waiters[deviceId]
+                waiters.remove(waiter)
+                if not waiters:
+                    del self._waiters[deviceId]
+        stats.failures += 1
+        raise PCACommandError(f"No answer from PCA301 device {deviceId}")
+
+    async def async_turn_on(self, deviceId):
+        _LOGGER.info(f"Turning ON PCA301 device {deviceId}")
+        await self.async_switch(deviceId, 1)
+        return True
 
-    def turn_off(self, deviceId):
-        # deviceId ist ein 9-stelliger String, z.B. '009088163'
-        channel = self._known_devices.get(deviceId, '01')
-        addr1 = int(deviceId[0:3])
-        addr2 = int(deviceId[3:6])
-        addr3 = int(deviceId[6:9])
-        chan = int(channel, 16) if isinstance(channel, str) else int(channel)
-        cmd = [chan, 5, addr1, addr2, addr3, 0, 255, 255, 255, 255]
-        _LOGGER.info(f"Turning OFF PCA301 device {deviceId} channel {channel} with command: {cmd}")
-        self._write_cmd(cmd)
-        self._devices[deviceId]["state"] = 0
-        _LOGGER.info(f"PCA301 device {deviceId} state set to OFF")
-        # Nach dem Umschalten Status
-        time.sleep(0.5)
-        self.status_request(deviceId)
+    async def async_turn_off(self, deviceId):
+        _LOGGER.info(f"Turning OFF PCA301 device {deviceId}")
+        await self.async_switch(deviceId, 0)
         return True
 
-    def turn_on(self, deviceId):
-        # deviceId ist ein 9-stelliger String, z.B. '009088163'
-        channel = self._known_devices.get(deviceId, '01')
-        addr1 = int(deviceId[0:3])
-        addr2 = int(deviceId[3:6])
-        addr3 = int(deviceId[6:9])
-        chan = int(channel, 16) if isinstance(channel, str) else int(channel)
-        cmd = [chan, 5, addr1, addr2, addr3, 1, 255, 255, 255, 255]
-        _LOGGER.info(f"Turning ON PCA301 device {deviceId} channel {channel} with command: {cmd}")
-        self._write_cmd(cmd)
-        self._devices[deviceId]["state"] = 1
-        _LOGGER.info(f"PCA301 device {deviceId} state set to ON")
-        # Nach dem Umschalten Status abfragen
-        time.sleep(0.5)
-        self.status_request(deviceId)
+    async def async_switch(self, deviceId, value, channel=None, deadline=None):
+        """Switch a device and wait until it reports the wanted state.
+
+        A command for a device that is still being switched supersedes the
+        previous one: only the latest wanted state is sent (a queued, not
+        yet transmitted command is dropped) and all callers get the result
+        of that one. Raises PCACommandError if the plug did not confirm the
+        state before the command deadline (``deadline`` seconds if given).
+
+        Without ``channel`` the hub (if any) picks the stick to send through.
+        """
+        if channel is None and self._hub is not None:
+            return await self._hub.async_switch(deviceId, value)
+        job = self._switch_jobs.get(deviceId)
+        if job is None:
+            job = self._switch_jobs[deviceId] = _SwitchJob(
+                value, self._hass.loop.create_future()
+            )
+            self._hass.async_create_task(
+                self._async_run_switch(deviceId, job, channel, deadline)
+            )
+        elif job.value != value:
+            _LOGGER.debug(f"Command for {deviceId} superseded by state {value}")
+            job.value = value
+            job.changed.set()
+        return await asyncio.shield(job.future)
+
+    async def _async_run_switch(self, deviceId, job, channel=None, deadline=None):
+        loop = self._hass.loop
+        if deadline is None:
+            deadline = self.command_deadline
+        deadline += loop.time()
+        backoff = self.command_timeout
+        try:
+            while True:
+                value = job.value
+                job.changed.clear()
+                send = asyncio.ensure_future(
+                    self.async_send_command(
+                        deviceId,
+                        CMD_SWITCH,
+                        value,
+                        lambda report, value=value: report.state == value,
+                        retries=0,
+                        channel=channel,
+                    )
+                )
+                changed = asyncio.ensure_future(job.changed.wait())
+                await asyncio.wait({send, changed}, return_when=asyncio.FIRST_COMPLETED)
+                if not send.done():
+                    # Superseded, a command still in the send queue is dropped
+                    send.cancel()
+                    continue
+                changed.cancel()
+                try:
+                    report = send.result()
+                except PCACommandError:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        raise
+                    delay = min(backoff * random.uniform(0.5, 1.5), remaining)
+                    backoff *= 2
+                    self.stats.retries += 1
+                    _LOGGER.debug(f"Retrying {deviceId} in {delay:.2f}s")
+                    # Wake up early if a newer state is wanted meanwhile
+                    with contextlib.suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(job.changed.wait(), delay)
+                    continue
+                if job.value == value:
+                    job.future.set_result(report)
+                    return
+        except Exception as e:
+            job.future.set_exception(e)
+        finally:
+            del self._switch_jobs[deviceId]
+
+    async def async_set_states(self, states):
+        """Switch several devices at once.
+
+        ``states`` maps device ids to the wanted on/off state. Devices
+        already reported in that state are skipped, the others are switched
+        back to back. Returns a mapping of device id to "ok", "skipped" or
+        "failed".
+        """
+        results = {}
+        pending = {}
+        for deviceId, on in states.items():
+            snapshot = self._snapshots.get(deviceId)
+            # Restored states may be outdated, only trust reports of this run
+            if deviceId in self._reported and snapshot.state == int(on):
+                results[deviceId] = "skipped"
+            elif on:
+                pending[deviceId] = self.async_turn_on(deviceId)
+            else:
+                pending[deviceId] = self.async_turn_off(deviceId)
+        outcomes = await asyncio.gather(*pending.values(), return_exceptions=True)
+        for deviceId, outcome in zip(pending, outcomes):
+            if isinstance(outcome, Exception):
+                _LOGGER.warning(f"Could not switch PCA301 device {deviceId}: {outcome}")
+                results[deviceId] = "failed"
+            else:
+                results[deviceId] = "ok"
+        return results
+
+    async def async_status_request(
+        self, deviceId, timeout=None, retries=None, channel=None
+    ):
+        """Request a fresh report from the device."""
+        if channel is None and self._hub is not None:
+            return await self._hub.async_status_request(deviceId, timeout, retries)
+        await self.async_send_command(
+            deviceId, CMD_MEASURE, 0, None, timeout, retries, channel=channel
+        )
         return True
 
-    def _refresh(self):
-        while not self._stopevent.is_set():
-            if not self._serial or not self._serial.is_open:
-                _LOGGER.warning("Serial port closed, refresh thread exiting.")
-                break
+    async def async_poll_status(self, deviceId, channel=None):
+        """Background status request, queued behind user commands."""
+        if channel is None and self._hub is not None:
+            return await self._hub.async_poll_status(deviceId)
+        return await self.async_send_command(
+            deviceId, CMD_MEASURE, retries=0, priority=PRIORITY_POLL, channel=channel
+        )
 
-            # Kurze Pause, um anderen Threads Zugriff zu ermöglichen
-            time.sleep(0.1)
+    def turn_on(self, deviceId):
+        """Turn a device on from a worker thread."""
+        return asyncio.run_coroutine_threadsafe(
+            self.async_turn_on(deviceId), self._hass.loop
+        ).result()
 
-            # Lock für Lesezugriff
-            if not self._serial_lock.acquire(blocking=False):
-                # Lock ist belegt, überspringen und nächsten Durchlauf abwarten
-                continue
+    def turn_off(self, deviceId):
+        """Turn a device off from a worker thread."""
+        return asyncio.run_coroutine_threadsafe(
+            self.async_turn_off(deviceId), self._hass.loop
+        ).result()
 
-            try:
-                # Kurzes Timeout für readline, damit Thread nicht ewig blockiert
-                self._serial.timeout = 0.5
-                line = self._serial.readline()
-                try:
-                    line = line.encode().decode("utf-8")
-                except AttributeError:
-                    line = line.decode("utf-8")
-                if self._re_reading.match(line):
-                    _LOGGER.debug("[PCA301] _refresh received line: %r", line)
-                    line = line.split(" ")
-                    deviceId = (
-                        str(line[4]).zfill(3)
-                        + str(line[5]).zfill(3)
-                        + str(line[6]).zfill(3)
-                    )
-                    # Ensure device dict exists
-                    if deviceId not in self._devices:
-                        self._devices[deviceId] = {
-                            "state": None,
-                            "power": None,
-                            "consumption": None,
-                            "channel": None,
-                        }
-                    self._devices[deviceId]["power"] = (
-                        int(line[8]) * 256 + int(line[9])
-                    ) / 10.0
-                    self._devices[deviceId]["state"] = int(line[7])
-                    self._devices[deviceId]["consumption"] = (
-                        int(line[10]) * 256 + int(line[11])
-                    ) / 100.0
-                    # Notify Home Assistant to enable entities for this device
-                    if hasattr(self, "_hass") and self._hass:
-                        self.notify_new_data(self._hass, deviceId)
-            except serial.SerialException as e:
-                _LOGGER.warning(
-                    f"Serial exception in refresh thread: {e}, exiting thread."
-                )
-                break
-            except Exception as e:
-                _LOGGER.error(f"Unexpected exception in refresh thread: {e}")
-            finally:
-                self._serial_lock.release()
+    def status_request(self, deviceId, timeout=2):
+        """Request a fresh report from a worker thread, False if none arrives."""
+        try:
+            return asyncio.run_coroutine_threadsafe(
+                self.async_status_request(deviceId, timeout, 0), self._hass.loop
+            ).result()
+        except PCACommandError:
+            return False
+
+    def _handle_line(self, line):
+        """Process a line received from the stick (runs in the event loop)."""
+        report = decode_report(line)
+        if report is None:
+            if line.startswith(REPORT_TOKEN):
+                self.stats.parse_failures += 1
+            elif FIRMWARE_BANNER in line and not self._ready.is_set():
+                _LOGGER.info(f"Firmware on {self._port}: {line.decode(errors='replace')}")
+                self._set_ready()
+            return
+        self.stats.frames_parsed += 1
+        if report.command != CMD_MEASURE:
+            return
+        if not self._ready.is_set():
+            # Older firmware without banner, a report proves the stick works
+            self._set_ready()
+        if report.raw_power == NO_MEASUREMENT:
+            # Pairing or display frame, its values are no measurement
+            return
+        _LOGGER.debug("[PCA301] received report: %s", report)
+        deviceId = format_device_id(report.device)
+        now = time.time()
+        if self._hub is not None:
+            # The hub hands the report to the PCA owning the device
+            self._hub.heard(self, deviceId, report, now)
+        else:
+            self._apply_report(deviceId, report, now)
+        if deviceId in self._waiters:
+            self._resolve_waiters(deviceId, report)
+        if self._scan_ids is not None:
+            self._scan_report(deviceId, report)
+
+    def _apply_report(self, deviceId, report, now):
+        """Store the values of a report and notify the entities."""
+        device = self.get_device(deviceId)
+        changed = device.update(report, now)
+        self._publish(deviceId, device)
+        if (
+            changed
+            and self.state_store is not None
+            and deviceId in self._known_devices
+        ):
+            # Only paired plugs are persisted, not everything on the air
+            self.state_store.async_schedule_save()
+        if self.rolling is not None:
+            self.rolling.add(deviceId, now, report.power)
+        write_filter = self.write_filter
+        if deviceId not in self._reported:
+            self._reported.add(deviceId)
+            if write_filter is not None:
+                write_filter.should_write(deviceId, device, now)
+            write = VALUES
+        elif write_filter is None:
+            write = changed
+        else:
+            write = write_filter.should_write(deviceId, device, now)
+        if write or deviceId not in self._enabled_devices:
+            # Pushed to the entities with the next flush, once per tick
+            pending = self._pending_updates.get(deviceId)
+            if pending is None:
+                self._pending_updates[deviceId] = set(write)
+            else:
+                pending |= write
+            if not self._flush_scheduled:
+                self._flush_scheduled = True
+                self._hass.loop.call_soon(self._flush_updates)
+
+    def _flush_updates(self):
+        """Push the latest values of all devices reported since the last tick."""
+        self._flush_scheduled = False
+        pending, self._pending_updates = self._pending_updates, {}
+        if self.coordinator is None:
+            # No entities (temporary scan or replay instance)
+            return
+        # Push the new values to the entities showing them
+        self.coordinator.async_devices_updated(pending)
+        for deviceId in pending:
+            # Notify Home Assistant to enable entities for this device
+            self.notify_new_data(self._hass, deviceId)
 
     def notify_new_data(self, hass, device_id):
         """Enable entities for a device when new data is received."""
+        if device_id in self._enabled_devices:
+            return
+        if self._registry_index is None:
+            self._registry_index = RegistryIndex(hass, self._enabled_devices.discard)
+            self._registry_index.async_setup()
+        entity_ids = self._registry_index.async_entity_ids(device_id)
+        if entity_ids is None:
+            # Not registered (yet), the index re-arms us once it is
+            return
+        # Only once per device, until entities are added to it
+        self._enabled_devices.add(device_id)
+        entity_registry = er.async_get(hass)
+        for entity_id in list(entity_ids):
+            entity = entity_registry.async_get(entity_id)
+            if (
+                entity is not None
+                and entity.disabled_by is not None
+                # Optional sensors are disabled by default on purpose
+                and STATS_UNIQUE_ID_MARKER not in entity.unique_id
+            ):
+                entity_registry.async_update_entity(entity_id, disabled_by=None)
 
-        async def _enable_entities():
-            entity_registry = er.async_get(hass)
-            device_registry = dr.async_get(hass)
-            # Find the device entry for this device_id
-            target_device = None
-            for device in device_registry.devices.values():
-                for ident in device.identifiers:
-                    if ident[0] == "pca301" and ident[1] == device_id:
-                        target_device = device
-                        break
-                if target_device:
-                    break
-            if not target_device:
-                return
-            # Enable all entities for this device
-            for entity in list(entity_registry.entities.values()):
-                if (
-                    entity.device_id == target_device.id
-                    and entity.disabled_by is not None
-                ):
-                    entity_registry.async_update_entity(
-                        entity.entity_id, disabled_by=None
-                    )
-
-        # Schedule the enabling in the event loop in a thread-safe way
-        hass.loop.call_soon_threadsafe(lambda: asyncio.create_task(_enable_entities()))
-
-    def status_request(self, deviceId, timeout=2):
-        """Send a status request command to the device and wait for a fresh response."""
-        with self._serial_lock:
-            channel = self._known_devices.get(deviceId, "01")
-            addr1 = int(deviceId[0:3])
-            addr2 = int(deviceId[3:6])
-            addr3 = int(deviceId[6:9])
-            chan = int(channel, 16) if isinstance(channel, str) else int(channel)
-            # Command: [channel, 4, addr1, addr2, addr3, 0, 255, 255, 255, 255]
-            cmd = [chan, 4, addr1, addr2, addr3, 0, 255, 255, 255, 255]
-            cmd_str = ",".join(str(b) for b in cmd) + "s"
-            try:
-                self._serial.write(cmd_str.encode("ascii"))
-            except Exception as e:
-                _LOGGER.error(f"Error sending status request: {e}")
-                return False
-
-        # Wait for a new value in self._devices[deviceId]["state"]
-        start = time.time()
-        last_state = self._devices.get(deviceId, {}).get("state")
-        while time.time() - start < timeout:
-            new_state = self._devices.get(deviceId, {}).get("state")
-            if new_state != last_state:
-                return True
-            time.sleep(0.05)
-        return False
+    def _resolve_waiters(self, deviceId, report):
+        """Hand a report to the commands waiting for an answer of the device."""
+        for future, check in self._waiters[deviceId]:
+            if not future.done() and (check is None or check(report)):
+                future.set_result(report)
@@ -0,0 +1,116 @@
+"""Index of PCA301 devices and entities in the Home Assistant registries."""
+
+from homeassistant.core import callback
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+
+from .const import DOMAIN
+
+
+class RegistryIndex:
+    """Map PCA device ids to registry device ids and entity ids.
+
+    Built once from the registries and kept up to date from their update
+    events, so lookups per received frame are plain dict accesses.
+    ``on_change`` is called with the PCA device id whenever a device or
+    entity is added to (or moved to) a PCA device.
+    """
+
+    def __init__(self, hass, on_change=None):
+        self._hass = hass
+        self._on_change = on_change
+        self._device_ids = {}  # PCA device id: registry device id
+        self._pca_ids = {}  # registry device id: PCA device id
+        self._entity_ids = {}  # registry device id: set of entity ids
+        self._entity_devices = {}  # entity id: registry device id
+        self._unsubs = []
+
+    @callback
+    def async_setup(self):
+        """Build the index and start following registry updates."""
+        for device in dr.async_get(self._hass).devices.values():
+            self._index_device(device)
+        for entity in er.async_get(self._hass).entities.values():
+            self._index_entity(entity.entity_id, entity.device_id)
+        self._unsubs = [
+            self._hass.bus.async_listen(
+                dr.EVENT_DEVICE_REGISTRY_UPDATED, self._async_device_updated
+            ),
+            self._hass.bus.async_listen(
+                er.EVENT_ENTITY_REGISTRY_UPDATED, self._async_entity_updated
+            ),
+        ]
+
+    @callback
+    def async_stop(self):
+        """Stop following registry updates."""
+        for unsub in self._unsubs:
+            unsub()
+        self._unsubs = []
+
+    @callback
+    def async_entity_ids(self, device_id):
+        """Return the entity ids of a PCA device, None if it is not registered."""
+        registry_id = self._device_ids.get(device_id)
+        if registry_id is None:
+            return None
+        return self._entity_ids.get(registry_id, set())
+
+    def _index_device(self, device):
+        for domain, device_id in device.identifiers:
+            if domain == DOMAIN:
+                self._device_ids[device_id] = device.id
+                self._pca_ids[device.id] = device_id
+                return device_id
+        return None
+
+    def _index_entity(self, entity_id, registry_id):
+        if registry_id not in self._pca_ids:
+            return None
+        self._entity_devices[entity_id] = registry_id
+        self._entity_ids.setdefault(registry_id, set()).add(entity_id)
+        return self._pca_ids[registry_id]
+
+    def _remove_entity(self, entity_id):
+        registry_id = self._entity_devices.pop(entity_id, None)
+        if registry_id is None:
+            return None
+        self._entity_ids.get(registry_id, set()).discard(entity_id)
+        return self._pca_ids.get(registry_id)
+
+    @callback
+    def _async_device_updated(self, event):
+        registry_id = event.data["device_id"]
+        action = event.data["action"]
+        if action == "remove":
+            device_id = self._pca_ids.pop(registry_id, None)
+            if device_id is not None:
+                self._device_ids.pop(device_id, None)
+                for entity_id in self._entity_ids.pop(registry_id, ()):
+                    self._entity_devices.pop(entity_id, None)
+            return
+        device = dr.async_get(self._hass).async_get(registry_id)
+        device_id = self._index_device(device) if device else None
+        if device_id is not None and action == "create":
+            # Entities may have been registered before their device
+            for entity in er.async_entries_for_device(
+                er.async_get(self._hass), registry_id, True
+            ):
+                self._index_entity(entity.entity_id, registry_id)
+            self._changed(device_id)
+
+    @callback
+    def _async_entity_updated(self, event):
+        entity_id = event.data["entity_id"]
+        old_device = self._remove_entity(event.data.get("old_entity_id", entity_id))
+        if event.data["action"] == "remove":
+            return
+        entity = er.async_get(self._hass).async_get(entity_id)
+        if entity is None:
+            return
+        new_device = self._index_entity(entity_id, entity.device_id)
+        if new_device != old_device:
+            self._changed(new_device)
+
+    def _changed(self, device_id):
+        if device_id is not None and self._on_change is not None:
+            self._on_change(device_id)
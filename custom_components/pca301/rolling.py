@@ -0,0 +1,159 @@
+"""Rolling power statistics per plug, updated in constant time per sample.
+
+Samples live in a fixed-size ring (``array('d')`` times, ``array('f')``
+power values). Sum and time-weighted area are kept incrementally and
+minimum/maximum come from monotonic deques, so neither adding a sample
+nor reading a statistic walks the history.
+
+Nothing in here depends on Home Assistant.
+"""
+
+from array import array
+from collections import deque
+
+DEFAULT_SAMPLES = 512  # per plug and window, older samples drop out early
+
+
+class RollingWindow:
+    """Power statistics of one plug over the last ``window`` seconds.
+
+    The window covers the samples of the last ``window`` seconds plus the
+    sample in effect at its start, so the time-weighted average always
+    spans the full window once enough history exists.
+    """
+
+    __slots__ = (
+        "window",
+        "_size",
+        "_times",
+        "_values",
+        "_first",
+        "_next",
+        "_sum",
+        "_area",
+        "_min",
+        "_max",
+    )
+
+    def __init__(self, window, size=DEFAULT_SAMPLES):
+        self.window = window
+        self._size = size
+        self._times = array("d", bytes(8 * size))
+        self._values = array("f", bytes(4 * size))
+        self._first = 0  # sequence number of the oldest sample
+        self._next = 0  # sequence number of the next sample
+        self._sum = 0.0  # of the values in the ring
+        self._area = 0.0  # W*s between the oldest and the newest sample
+        self._min = deque()  # sequence numbers with increasing values
+        self._max = deque()  # sequence numbers with decreasing values
+
+    def __len__(self):
+        return self._next - self._first
+
+    def add(self, when, value):
+        """Add a power sample taken at ``when`` (seconds)."""
+        size = self._size
+        times = self._times
+        values = self._values
+        seq = self._next
+        if seq > self._first:
+            last = (seq - 1) % size
+            self._area += values[last] * (when - times[last])
+            if seq - self._first == size:
+                self._evict()
+        slot = seq % size
+        times[slot] = when
+        values[slot] = value
+        value = values[slot]  # as stored (float32)
+        self._sum += value
+        self._next = seq + 1
+        minimum = self._min
+        while minimum and values[minimum[-1] % size] >= value:
+            minimum.pop()
+        minimum.append(seq)
+        maximum = self._max
+        while maximum and values[maximum[-1] % size] <= value:
+            maximum.pop()
+        maximum.append(seq)
+        self.expire(when)
+
+    def expire(self, now):
+        """Drop samples whose successor is older than the window as well."""
+        start = now - self.window
+        times = self._times
+        size = self._size
+        while self._next - self._first > 1 and times[(self._first + 1) % size] <= start:
+            self._evict()
+
+    def _evict(self):
+        size = self._size
+        first = self._first
+        slot = first % size
+        following = (first + 1) % size
+        value = self._values[slot]
+        self._sum -= value
+        self._area -= value * (self._times[following] - self._times[slot])
+        self._first = first + 1
+        if self._min[0] == first:
+            self._min.popleft()
+        if self._max[0] == first:
+            self._max.popleft()
+
+    @property
+    def mean(self):
+        """Mean of the samples, None without samples."""
+        count = self._next - self._first
+        return self._sum / count if count else None
+
+    @property
+    def minimum(self):
+        return self._values[self._min[0] % self._size] if self._min else None
+
+    @property
+    def maximum(self):
+        return self._values[self._max[0] % self._size] if self._max else None
+
+    def time_weighted_mean(self, now):
+        """Average power over the window up to ``now``, None without samples."""
+        if self._next == self._first:
+            return None
+        self.expire(now)
+        size = self._size
+        first = self._first % size
+        last = (self._next - 1) % size
+        times = self._times
+        values = self._values
+        start = max(now - self.window, times[first])
+        # Area of the ring, minus the part before the window, plus the open end
+        area = (
+            self._area
+            - values[first] * (start - times[first])
+            + values[last] * (now - times[last])
+        )
+        duration = now - start
+        return area / duration if duration > 0 else float(values[last])
+
+
+class RollingStats:
+    """Rolling windows of all plugs of one stick."""
+
+    def __init__(self, windows, size=DEFAULT_SAMPLES):
+        self.windows = tuple(windows)
+        self._size = size
+        self._devices = {}  # deviceId: tuple of RollingWindow
+
+    def add(self, deviceId, when, value):
+        windows = self._devices.get(deviceId)
+        if windows is None:
+            windows = self._devices[deviceId] = tuple(
+                RollingWindow(window, self._size) for window in self.windows
+            )
+        for rolling in windows:
+            rolling.add(when, value)
+
+    def get(self, deviceId, window):
+        """Return the RollingWindow of a device, None before its first sample."""
+        windows = self._devices.get(deviceId)
+        if windows is None:
+            return None
+        return windows[self.windows.index(window)]
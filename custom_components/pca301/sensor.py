@@ -1,23 +1,48 @@
 """PCA301 sensor platform for Home Assistant."""
 from __future__ import annotations
 
-import asyncio
 import logging
-from datetime import timedelta
 
 from homeassistant.components.sensor import SensorEntity, SensorDeviceClass
 from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import callback
+from homeassistant.util import dt as dt_util
 from homeassistant.helpers import device_registry as dr
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity import EntityCategory
 
+from . import stats_windows
+from .const import SIGNAL_NEW_DEVICES, STATS_UNIQUE_ID_MARKER
+from .device_state import CONSUMPTION, POWER
+
+# Rolling power statistics sensors per window: (kind, name, icon)
+ROLLING_SENSORS = (
+    ("mean", "Power mean", "mdi:chart-bell-curve"),
+    ("min", "Power minimum", "mdi:arrow-collapse-down"),
+    ("max", "Power maximum", "mdi:arrow-collapse-up"),
+    ("average", "Power average", "mdi:chart-areaspline"),
+)
+
+# Runtime counters of the stick shown on the hub device:
+# (key in PCA.get_stats(), name, unit, icon, state class)
+PIPELINE_SENSORS = (
+    ("frames_received", "Frames received", None, "mdi:download-network", "total_increasing"),
+    ("frames_parsed", "Frames parsed", None, "mdi:check-network", "total_increasing"),
+    ("parse_failures", "Parse failures", None, "mdi:alert-network", "total_increasing"),
+    ("bytes_discarded", "Bytes discarded", "B", "mdi:delete-variant", "total_increasing"),
+    ("commands_sent", "Commands sent", None, "mdi:upload-network", "total_increasing"),
+    ("retries", "Command retries", None, "mdi:repeat", "total_increasing"),
+    ("timeouts", "Command timeouts", None, "mdi:timer-alert", "total_increasing"),
+    ("queue_wait_mean_ms", "Send queue wait", "ms", "mdi:timer-sand", "measurement"),
+    ("rtt_mean_ms", "Command round trip", "ms", "mdi:timer-outline", "measurement"),
+)
+
 _LOGGER = logging.getLogger(__name__)
 
 
 async def async_setup_entry(hass, entry, async_add_entities):
     """Set up PCA301 sensor platform from a config entry."""
     pca = hass.data["pca301"][entry.entry_id]
-    pca_lock = asyncio.Lock()
 
     # Get devices from channel mapping in options
     channel_mapping = entry.options.get("channels", {})
@@ -35,7 +60,7 @@ async def async_setup_entry(hass, entry, async_add_entities):
         device_ids = []
         for device in registry_devices:
             for ident in device.identifiers:
-                if ident[0] == "pca301":
+                if ident[0] == "pca301" and ident[1] != entry.entry_id:
                     device_ids.append(ident[1])
 
     # --- Device Registry: Geräte explizit anlegen (wie UniFi) ---
@@ -49,33 +74,44 @@ async def async_setup_entry(hass, entry, async_add_entities):
             name=f"PCA301 {device_id}",
         )
 
+    # Hub device for the stick itself, identified by the config entry
+    device_registry.async_get_or_create(
+        config_entry_id=entry.entry_id,
+        identifiers={("pca301", entry.entry_id)},
+        manufacturer="JeeLabs",
+        model="JeeLink",
+        name=f"PCA301 Stick {pca.port}",
+    )
+
     _LOGGER.info(
         f"[PCA301] Gerätezustände in async_setup_entry: _devices={pca._devices}"
     )
     entities = []
     for device_id in device_ids:
-        # Ensure device exists in pca._devices
-        if device_id not in pca._devices and device_id in pca._known_devices:
-            pca._devices[device_id] = {
-                "state": 0,
-                "consumption": 0,
-                "power": 0,
-                "channel": pca._known_devices[device_id],
-            }
-
-        device_data = pca._devices.get(device_id, {})
-        power = device_data.get("power", 0)
-        consumption = device_data.get("consumption", 0)
+        device_data = pca.get_device(device_id)
+        power = device_data.power
+        consumption = device_data.consumption
         channel_val = pca._known_devices.get(device_id)
         _LOGGER.debug(f"Setting up sensors for device {device_id}: power={power}, consumption={consumption}, channel={channel_val}")
-        entities.append(PowerSensor(hass, pca, pca_lock, device_id, initial_value=power))
-        entities.append(ConsumptionSensor(hass, pca, pca_lock, device_id, initial_value=consumption))
+        entities.append(PowerSensor(hass, pca, device_id, initial_value=power))
+        entities.append(ConsumptionSensor(hass, pca, device_id, initial_value=consumption))
         entities.append(ChannelDiagnosticSensor(hass, pca, device_id, initial_value=channel_val))
         entities.append(UniqueIdDiagnosticSensor(hass, device_id))
+    for description in PIPELINE_SENSORS:
+        entities.append(PipelineDiagnosticSensor(hass, pca, entry.entry_id, *description))
 
     async_add_entities(entities)
     for entity in entities:
         entity.async_write_ha_state()
+    # Optional, disabled by default
+    windows = stats_windows(entry.options)
+    async_add_entities(
+        [
+            entity
+            for device_id in device_ids
+            for entity in rolling_sensors(pca, device_id, windows)
+        ]
+    )
 
     # Listen for new devices via dispatcher
     async def async_add_new_devices(new_device_ids):
@@ -88,19 +124,37 @@ async def async_setup_entry(hass, entry, async_add_entities):
                 model="PCA301",
                 name=f"PCA301 {device_id}",
             )
+            # Values of the report the device was found with
+            device_data = pca.get_device(device_id)
             async_add_entities([
-                PowerSensor(hass, pca, pca_lock, device_id),
-                ConsumptionSensor(hass, pca, pca_lock, device_id),
-                ChannelDiagnosticSensor(hass, pca, device_id),
+                PowerSensor(hass, pca, device_id, initial_value=device_data.power),
+                ConsumptionSensor(
+                    hass, pca, device_id, initial_value=device_data.consumption
+                ),
+                ChannelDiagnosticSensor(
+                    hass, pca, device_id,
+                    initial_value=pca.known_devices.get(device_id),
+                ),
+                UniqueIdDiagnosticSensor(hass, device_id),
+                *rolling_sensors(pca, device_id, windows),
             ])
     async_dispatcher_connect(
         hass,
-        f"pca301_new_devices_{entry.entry_id}",
+        SIGNAL_NEW_DEVICES.format(entry.entry_id),
         async_add_new_devices,
     )
     hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, pca.close)
 
 
+def rolling_sensors(pca, device_id, windows):
+    """Return the rolling statistics sensors of a device."""
+    return [
+        RollingPowerSensor(pca, device_id, minutes, *description)
+        for minutes in windows
+        for description in ROLLING_SENSORS
+    ]
+
+
 class ChannelDiagnosticSensor(SensorEntity):
     """Diagnostic sensor for PCA301 channel."""
     _attr_icon = "mdi:lan"
@@ -164,15 +218,48 @@ class UniqueIdDiagnosticSensor(SensorEntity):
     def extra_state_attributes(self):
         return {}
 
-class PowerSensor(SensorEntity):
-    SCAN_INTERVAL = timedelta(seconds=10)
+class PipelineDiagnosticSensor(SensorEntity):
+    """Diagnostic sensor for one runtime counter of the PCA301 stick."""
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_has_entity_name = True
+
+    def __init__(self, hass, pca, entry_id, key, name, unit, icon, state_class):
+        self.hass = hass
+        self._pca = pca
+        self._key = key
+        self._attr_name = name
+        self._attr_native_unit_of_measurement = unit
+        self._attr_icon = icon
+        self._attr_state_class = state_class
+        self._attr_unique_id = f"pca301_{entry_id}_{key}"
+        self._attr_device_info = {
+            "identifiers": {("pca301", entry_id)},
+            "name": f"PCA301 Stick {pca.port}",
+            "manufacturer": "JeeLabs",
+            "model": "JeeLink",
+        }
 
+    @property
+    def native_value(self):
+        # Polled, the counters change with every frame
+        return self._pca.get_stats()[self._key]
+
+    @property
+    def extra_state_attributes(self):
+        if self._key == "rtt_mean_ms":
+            return {"histogram": self._pca.stats.rtt_buckets()}
+        if self._key == "queue_wait_mean_ms":
+            return {"max_ms": self._pca.get_stats()["queue_wait_max_ms"]}
+        return {}
+
+
+class PowerSensor(SensorEntity):
     _attr_has_entity_name = True
+    _attr_should_poll = False
 
-    def __init__(self, hass, pca, pca_lock, device_id, initial_value=None):
+    def __init__(self, hass, pca, device_id, initial_value=None):
         self.hass = hass
         self._pca = pca
-        self._pca_lock = pca_lock
         self._device_id = device_id
         self._attr_name = "Power"
         self._attr_native_unit_of_measurement = "W"
@@ -181,29 +268,32 @@ class PowerSensor(SensorEntity):
         self._attr_icon = "mdi:flash"
         self._attr_unique_id = f"pca301_power_{device_id}"
         self._state = initial_value
-        self._available = False
-
-    async def async_update(self):
-        try:
-            async with self._pca_lock:
-                self._state = await self.hass.async_add_executor_job(
-                    self._pca.get_current_power, self._device_id
-                )
-            self._available = True
-            self.async_write_ha_state()
-        except Exception as ex:
-            if self._available:
-                _LOGGER.warning("Could not read power for %s: %s", self._device_id, ex)
-            self._available = False
+
+    async def async_added_to_hass(self):
+        """Subscribe to the updates fanned out by the coordinator."""
+        coordinator = self._pca.coordinator
+        self.async_on_remove(
+            coordinator.async_add_listener(
+                self._device_id, self._async_handle_update, POWER
+            )
+        )
+        self.async_on_remove(
+            coordinator.async_add_connection_listener(self.async_write_ha_state)
+        )
+
+    @callback
+    def _async_handle_update(self):
+        """Take over the latest power value of the device."""
+        self._state = self._pca.get_current_power(self._device_id)
+        self.async_write_ha_state()
 
     @property
     def available(self) -> bool:
-        return self._available
+        # Available as soon as the stick is ready, unknown until reported
+        return self._pca.available
 
     @property
     def native_value(self):
-        if not self._available:
-            return None
         return self._state
 
     @property
@@ -230,14 +320,12 @@ class PowerSensor(SensorEntity):
 
 
 class ConsumptionSensor(SensorEntity):
-    SCAN_INTERVAL = timedelta(seconds=10)
-
     _attr_has_entity_name = True
+    _attr_should_poll = False
 
-    def __init__(self, hass, pca, pca_lock, device_id, initial_value=None):
+    def __init__(self, hass, pca, device_id, initial_value=None):
         self.hass = hass
         self._pca = pca
-        self._pca_lock = pca_lock
         self._device_id = device_id
         self._attr_name = "Consumption"
         self._attr_native_unit_of_measurement = "kWh"
@@ -246,31 +334,32 @@ class ConsumptionSensor(SensorEntity):
         self._attr_icon = "mdi:counter"
         self._attr_unique_id = f"pca301_consumption_{device_id}"
         self._state = initial_value
-        self._available = False
-
-    async def async_update(self):
-        try:
-            async with self._pca_lock:
-                self._state = await self.hass.async_add_executor_job(
-                    self._pca.get_total_consumption, self._device_id
-                )
-            self._available = True
-            self.async_write_ha_state()
-        except Exception as ex:
-            if self._available:
-                _LOGGER.warning(
-                    "Could not read consumption for %s: %s", self._device_id, ex
-                )
-            self._available = False
+
+    async def async_added_to_hass(self):
+        """Subscribe to the updates fanned out by the coordinator."""
+        coordinator = self._pca.coordinator
+        self.async_on_remove(
+            coordinator.async_add_listener(
+                self._device_id, self._async_handle_update, CONSUMPTION
+            )
+        )
+        self.async_on_remove(
+            coordinator.async_add_connection_listener(self.async_write_ha_state)
+        )
+
+    @callback
+    def _async_handle_update(self):
+        """Take over the latest consumption value of the device."""
+        self._state = self._pca.get_total_consumption(self._device_id)
+        self.async_write_ha_state()
 
     @property
     def available(self) -> bool:
-        return self._available
+        # Available as soon as the stick is ready, unknown until reported
+        return self._pca.available
 
     @property
     def native_value(self):
-        if not self._available:
-            return None
         return self._state
 
     @property
@@ -289,10 +378,65 @@ class ConsumptionSensor(SensorEntity):
 
     @property
     def extra_state_attributes(self):
-        channel = None
-        if self._device_id in self._pca._devices:
-            channel = self._pca._devices[self._device_id].get("channel")
+        snapshot = self._pca.get_snapshot(self._device_id)
+        channel = snapshot.channel if snapshot is not None else None
         return {
             "channel": channel,
             "unique_id": self._attr_unique_id,
         }
+
+
+class RollingPowerSensor(SensorEntity):
+    """Rolling power statistic of a plug, computed in memory by the PCA."""
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+    _attr_entity_registry_enabled_default = False
+    _attr_native_unit_of_measurement = "W"
+    _attr_device_class = SensorDeviceClass.POWER
+    _attr_state_class = "measurement"
+
+    def __init__(self, pca, device_id, minutes, kind, name, icon):
+        self._pca = pca
+        self._device_id = device_id
+        self._window = minutes * 60
+        self._kind = kind
+        self._attr_name = f"{name} {minutes} min"
+        self._attr_icon = icon
+        self._attr_unique_id = f"pca301_{device_id}{STATS_UNIQUE_ID_MARKER}{kind}_{minutes}m"
+        self._attr_device_info = {
+            "identifiers": {("pca301", device_id)},
+            "name": f"PCA301 {device_id}",
+            "manufacturer": "ELV",
+            "model": "PCA301",
+        }
+
+    async def async_added_to_hass(self):
+        """Recalculate whenever the power of the plug is written."""
+        coordinator = self._pca.coordinator
+        self.async_on_remove(
+            coordinator.async_add_listener(
+                self._device_id, self.async_write_ha_state, POWER
+            )
+        )
+        self.async_on_remove(
+            coordinator.async_add_connection_listener(self.async_write_ha_state)
+        )
+
+    @property
+    def available(self) -> bool:
+        return self._pca.available
+
+    @property
+    def native_value(self):
+        rolling = self._pca.rolling.get(self._device_id, self._window)
+        if rolling is None:
+            return None
+        if self._kind == "mean":
+            value = rolling.mean
+        elif self._kind == "min":
+            value = rolling.minimum
+        elif self._kind == "max":
+            value = rolling.maximum
+        else:
+            value = rolling.time_weighted_mean(dt_util.utcnow().timestamp())
+        return None if value is None else round(value, 1)
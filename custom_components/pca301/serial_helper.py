@@ -1,8 +1,173 @@
 """Serial port helper utilities."""
 
+import asyncio
+import contextlib
+import logging
+import os
+import time
 from pathlib import Path
 
+import serial
+import serial_asyncio_fast
+from serial.tools import list_ports
+
+from .const import DOMAIN
+from .protocol import FIRMWARE_BANNER, VERSION_COMMAND
+
+_LOGGER = logging.getLogger(__name__)
+
+BY_ID = Path("/dev/serial/by-id")
+BAUDRATE = 57600
+PROBE_TIMEOUT = 2.5  # s, covers the reset of the JeeLink when the port opens
+CACHE_TTL = 120  # s, probe results are reused for this long
+# USB ids of the FTDI chips of JeeLink sticks (FT232R, FT230X)
+JEELINK_USB_IDS = {(0x0403, 0x6001), (0x0403, 0x6015)}
+JEELINK_NAMES = ("jeelink",)  # in by-id names or port descriptions
+
+_probe_cache = {}  # real device path: (monotonic time, PCA301 stick found)
+
+
+def serial_port_candidates():
+    """Return {stable path: real device path} of the USB serial ports (sync).
+
+    /dev/serial/by-id names survive reboots and replugging, plain
+    ttyUSB/ttyACM names are only listed for ports without one.
+    """
+    ports = {}
+    if BY_ID.is_dir():
+        for link in sorted(BY_ID.iterdir()):
+            ports[str(link)] = os.path.realpath(link)
+    linked = set(ports.values())
+    for pattern in ("ttyUSB*", "ttyACM*"):
+        for path in sorted(Path("/dev").glob(pattern)):
+            if str(path) not in linked:
+                ports[str(path)] = str(path)
+    return ports
+
 
 def list_serial_ports():
     """List available serial ports on Linux (sync)."""
-    return [str(p) for p in Path("/dev").glob("ttyUSB*")] + [str(p) for p in Path("/dev").glob("ttyACM*")]
+    return list(serial_port_candidates())
+
+
+def jeelink_ports():
+    """Return the real device paths of the ports that may be a JeeLink (sync).
+
+    Decided by USB id or name only, without opening anything, so the
+    sticks of other integrations (Zigbee, Z-Wave, ...) are left alone.
+    """
+    found = set()
+    for port in list_ports.comports():
+        description = f"{port.description} {port.manufacturer} {port.product}".lower()
+        if (port.vid, port.pid) in JEELINK_USB_IDS or any(
+            name in description for name in JEELINK_NAMES
+        ):
+            found.add(os.path.realpath(port.device))
+    if BY_ID.is_dir():
+        for link in BY_ID.iterdir():
+            if any(name in link.name.lower() for name in JEELINK_NAMES):
+                found.add(os.path.realpath(link))
+    return found
+
+
+async def async_probe_port(port, timeout=PROBE_TIMEOUT):
+    """Return True if the firmware on ``port`` identifies as pcaSerial.
+
+    The port is opened exclusively; None means it is in use by someone
+    else and was not probed.
+    """
+    try:
+        reader, writer = await serial_asyncio_fast.open_serial_connection(
+            url=port, baudrate=BAUDRATE, exclusive=True
+        )
+    except (serial.SerialException, OSError) as e:
+        _LOGGER.debug(f"Cannot probe {port}: {e}")
+        return None
+
+    async def read_banner():
+        # Sketches print the banner on reset and as answer to "v"
+        writer.write(VERSION_COMMAND)
+        while line := await reader.readline():
+            if FIRMWARE_BANNER in line:
+                return True
+        return False
+
+    try:
+        return await asyncio.wait_for(read_banner(), timeout)
+    except (asyncio.TimeoutError, serial.SerialException, OSError):
+        return False
+    finally:
+        writer.close()
+        with contextlib.suppress(Exception):
+            await writer.wait_closed()
+
+
+def _configured_ports(hass):
+    """Return the /dev paths in the config entries of other integrations."""
+    paths = set()
+    pending = [
+        config_entry.data
+        for config_entry in hass.config_entries.async_entries()
+        if config_entry.domain != DOMAIN
+    ]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+        elif isinstance(value, str) and value.startswith("/dev/"):
+            paths.add(value)
+    return paths
+
+
+def _resolve(in_use, others):
+    return (
+        serial_port_candidates(),
+        jeelink_ports(),
+        {os.path.realpath(path) for path in in_use},
+        {os.path.realpath(path) for path in others},
+    )
+
+
+async def async_list_pca_ports(hass, in_use=()):
+    """Return the ports with a PCA301 stick, probing the JeeLinks at once.
+
+    Only ports that look like a JeeLink by USB id or name are opened, and
+    only if no other integration is configured with them and no one else
+    holds them open exclusively. ``in_use`` are the ports of loaded
+    entries: they are not opened again, count as sticks and keep the name
+    they were configured with. Results are cached for CACHE_TTL, so
+    reopening a flow does not probe again. If no stick answers (e.g. older
+    firmware without banner, or an unknown USB chip), all ports not used
+    by other integrations are returned.
+    """
+    candidates, jeelinks, busy, others = await hass.async_add_executor_job(
+        _resolve, in_use, _configured_ports(hass)
+    )
+    now = time.monotonic()
+    probe = [
+        real
+        for real in dict.fromkeys(candidates.values())
+        if real in jeelinks
+        and real not in busy
+        and real not in others
+        and (real not in _probe_cache or now - _probe_cache[real][0] > CACHE_TTL)
+    ]
+    if probe:
+        results = await asyncio.gather(*(async_probe_port(real) for real in probe))
+        for real, found in zip(probe, results):
+            if found is not None:
+                # Busy ports are tried again next time
+                _probe_cache[real] = (now, found)
+        _LOGGER.debug(f"Probed serial ports: {dict(zip(probe, results))}")
+    ports = [path for path in in_use if path]
+    for path, real in candidates.items():
+        if (
+            real not in busy
+            and real not in others
+            and real in jeelinks
+            and _probe_cache.get(real, (0, False))[1]
+        ):
+            ports.append(path)
+    return ports or [path for path, real in candidates.items() if real not in others]
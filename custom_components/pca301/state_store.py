@@ -0,0 +1,70 @@
+"""Persistence of the last known plug values across restarts."""
+
+from homeassistant.core import callback
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+STORAGE_VERSION = 1
+SAVE_DELAY = 60  # s, changes within this time are written together
+
+
+class DeviceStateStore:
+    """Save the values of the plugs of one stick to Home Assistant storage.
+
+    Stored compactly as ``{deviceId: [state, power, consumption,
+    last_updated]}``, only for the plugs in the channel map: foreign or
+    unpaired plugs heard on the air are not kept. Saves are debounced: the
+    first change after a write schedules the next one, later changes only
+    update the data.
+    """
+
+    def __init__(self, hass, entry_id, pca):
+        self._store = Store(hass, STORAGE_VERSION, f"{DOMAIN}.states.{entry_id}")
+        self._pca = pca
+        self._save_pending = False
+
+    async def async_restore(self):
+        """Load the stored values into the PCA, return the number of plugs."""
+        data = await self._store.async_load()
+        if not data:
+            return 0
+        known = self._pca.known_devices
+        devices = {
+            deviceId: values
+            for deviceId, values in data.get("devices", {}).items()
+            if deviceId in known
+        }
+        for deviceId, values in devices.items():
+            self._pca.restore_device(deviceId, *values)
+        return len(devices)
+
+    @callback
+    def async_schedule_save(self):
+        """Save the values soon, called on every change."""
+        if not self._save_pending:
+            self._save_pending = True
+            self._store.async_delay_save(self._data_to_save, SAVE_DELAY)
+
+    async def async_save(self):
+        """Save the values now, e.g. on unload."""
+        await self._store.async_save(self._data_to_save())
+
+    async def async_remove(self):
+        await self._store.async_remove()
+
+    def _data_to_save(self):
+        self._save_pending = False
+        return {
+            "devices": {
+                deviceId: [
+                    device.state,
+                    device.power,
+                    device.consumption,
+                    device.last_updated,
+                ]
+                for deviceId, device in self._pca.get_devices().items()
+                if device.last_updated is not None
+                and deviceId in self._pca.known_devices
+            }
+        }
@@ -0,0 +1,94 @@
+"""Always-on runtime counters of one PCA stick connection."""
+
+from bisect import bisect_left
+
+# Upper bounds (ms) of the command round trip histogram buckets, the last
+# bucket collects everything slower
+RTT_BUCKETS = (50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class PCAStats:
+    """Counters of the serial/radio pipeline.
+
+    Only plain integer/float additions happen in the hot paths, so the
+    counters stay enabled all the time; ``as_dict`` builds the report.
+    """
+
+    __slots__ = (
+        "frames_received",
+        "frames_parsed",
+        "parse_failures",
+        "commands_sent",
+        "retries",
+        "timeouts",
+        "failures",
+        "queue_wait_total",
+        "queue_wait_max",
+        "rtt_total",
+        "rtt_count",
+        "rtt_histogram",
+    )
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.frames_received = 0
+        self.frames_parsed = 0
+        self.parse_failures = 0
+        self.commands_sent = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.queue_wait_total = 0.0  # s, enqueued until written to the stick
+        self.queue_wait_max = 0.0
+        self.rtt_total = 0.0  # s, written to the stick until answered
+        self.rtt_count = 0
+        self.rtt_histogram = [0] * (len(RTT_BUCKETS) + 1)
+
+    def add_queue_wait(self, seconds):
+        self.commands_sent += 1
+        self.queue_wait_total += seconds
+        if seconds > self.queue_wait_max:
+            self.queue_wait_max = seconds
+
+    def add_rtt(self, seconds):
+        self.rtt_total += seconds
+        self.rtt_count += 1
+        self.rtt_histogram[bisect_left(RTT_BUCKETS, seconds * 1000)] += 1
+
+    @property
+    def queue_wait_mean(self):
+        """Mean time (ms) commands waited for the radio."""
+        if not self.commands_sent:
+            return None
+        return round(self.queue_wait_total / self.commands_sent * 1000, 1)
+
+    @property
+    def rtt_mean(self):
+        """Mean command round trip time (ms)."""
+        if not self.rtt_count:
+            return None
+        return round(self.rtt_total / self.rtt_count * 1000, 1)
+
+    def rtt_buckets(self):
+        """Return the round trip histogram as {"<=50 ms": count, ...}."""
+        labels = [f"<={bound} ms" for bound in RTT_BUCKETS]
+        labels.append(f">{RTT_BUCKETS[-1]} ms")
+        return dict(zip(labels, self.rtt_histogram))
+
+    def as_dict(self, bytes_discarded=0):
+        return {
+            "frames_received": self.frames_received,
+            "frames_parsed": self.frames_parsed,
+            "parse_failures": self.parse_failures,
+            "bytes_discarded": bytes_discarded,
+            "commands_sent": self.commands_sent,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "queue_wait_mean_ms": self.queue_wait_mean,
+            "queue_wait_max_ms": round(self.queue_wait_max * 1000, 1),
+            "rtt_mean_ms": self.rtt_mean,
+            "rtt_histogram": self.rtt_buckets(),
+        }
@@ -4,7 +4,6 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from datetime import timedelta
 
 
 import serial
@@ -12,7 +11,8 @@ from serial import SerialException
 
 from homeassistant.components.switch import SwitchEntity
 from homeassistant.const import EVENT_HOMEASSISTANT_STOP, CONF_DEVICE
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
@@ -20,6 +20,9 @@ from typing import Any
 from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
 
 from . import pypca
+from .const import SIGNAL_NEW_DEVICES
+from .coordinator import PCACoordinator
+from .device_state import STATE
 
 
 _LOGGER = logging.getLogger(__name__)
@@ -35,18 +38,18 @@ def setup_platform(
 ) -> None:
     """Set up the PCA switch platform (YAML)."""
 
-    pca_lock = asyncio.Lock()
     if discovery_info is None:
         return
     serial_device = discovery_info[CONF_DEVICE]
     try:
         pca = pypca.PCA(hass, serial_device)
+        PCACoordinator(hass, pca)
         loop = asyncio.get_event_loop()
         loop.run_until_complete(pca.async_load_known_devices(hass))
         pca.open()
         # Blockierende Aufrufe auslagern
         devices = loop.run_until_complete(hass.async_add_executor_job(pca.get_devices))
-        entities = [SmartPlugSwitch(hass, pca, pca_lock, device) for device in devices]
+        entities = [SmartPlugSwitch(hass, pca, device) for device in devices]
         add_entities(entities, True)
     except SerialException as exc:
         _LOGGER.warning("Unable to open serial port: %s", exc)
@@ -58,7 +61,6 @@ async def async_setup_entry(hass, entry, async_add_entities):
     _LOGGER.info(f"async_setup_entry: {entry.data.get('device')}")
     try:
         pca = hass.data["pca301"][entry.entry_id]
-        pca_lock = asyncio.Lock()
 
         # Get devices from channel mapping in options
         channel_mapping = entry.options.get("channels", {})
@@ -78,7 +80,7 @@ async def async_setup_entry(hass, entry, async_add_entities):
             device_ids = []
             for device in registry_devices:
                 for ident in device.identifiers:
-                    if ident[0] == "pca301":
+                    if ident[0] == "pca301" and ident[1] != entry.entry_id:
                         device_ids.append(ident[1])
             _LOGGER.debug(f"[PCA301 Switch] Fallback to registry: {len(registry_devices)} devices found, device_ids: {device_ids}")
 
@@ -97,20 +99,11 @@ async def async_setup_entry(hass, entry, async_add_entities):
         _LOGGER.debug(f"[PCA301 Switch] Device states: _devices={pca._devices}, _known_devices={pca._known_devices}")
         entities = []
         for device_id in device_ids:
-            # Ensure device exists in pca._devices
-            if device_id not in pca._devices and device_id in pca._known_devices:
-                pca._devices[device_id] = {
-                    "state": 0,
-                    "consumption": 0,
-                    "power": 0,
-                    "channel": pca._known_devices[device_id],
-                }
-
-            device_data = pca._devices.get(device_id, {})
-            initial_state = device_data.get("state", None)
+            device_data = pca.get_device(device_id)
+            initial_state = device_data.state
             _LOGGER.debug(f"[PCA301 Switch] Creating switch for device {device_id}: initial_state={initial_state}, device_data={device_data}")
             switch = SmartPlugSwitch(
-                hass, pca, pca_lock, device_id, initial_value=initial_state
+                hass, pca, device_id, initial_value=initial_state
             )
             entities.append(switch)
         _LOGGER.info(f"[PCA301 Switch] Adding {len(entities)} switch entities")
@@ -129,13 +122,15 @@ async def async_setup_entry(hass, entry, async_add_entities):
                     model="PCA301",
                     name=f"PCA301 {device_id}",
                 )
-                switch = SmartPlugSwitch(hass, pca, pca_lock, device_id)
+                switch = SmartPlugSwitch(
+                    hass, pca, device_id, initial_value=pca.get_state(device_id)
+                )
                 # Switch is now enabled by default
                 async_add_entities([switch])
 
         async_dispatcher_connect(
             hass,
-            f"pca301_new_devices_{entry.entry_id}",
+            SIGNAL_NEW_DEVICES.format(entry.entry_id),
             async_add_new_devices,
         )
     except SerialException as exc:
@@ -147,17 +142,17 @@ async def async_setup_entry(hass, entry, async_add_entities):
 class SmartPlugSwitch(SwitchEntity):
     """Representation of a PCA Smart Plug switch."""
 
-    SCAN_INTERVAL = timedelta(seconds=10)
+    _attr_should_poll = False
 
-    def __init__(self, hass, pca, pca_lock, device_id, initial_value=None):
+    def __init__(self, hass, pca, device_id, initial_value=None):
         """Initialize the switch."""
         self.hass = hass
         self._device_id = device_id
         self._attr_name = "Switch"
         self._state = initial_value
-        self._available = False
+        # False after the plug did not confirm a command, until it reports again
+        self._available = True
         self._pca = pca
-        self._pca_lock = pca_lock
         self._attr_icon = "mdi:power"
         self._attr_unique_id = f"pca301_{device_id}_switch"
         self._attr_device_info = {
@@ -169,12 +164,37 @@ class SmartPlugSwitch(SwitchEntity):
 
     async def async_added_to_hass(self):
         """Call when entity is added to hass."""
+        coordinator = self._pca.coordinator
+        self.async_on_remove(
+            coordinator.async_add_listener(
+                self._device_id, self._async_handle_update, STATE
+            )
+        )
+        self.async_on_remove(
+            coordinator.async_add_listener(self._device_id, self._async_handle_report)
+        )
+        self.async_on_remove(
+            coordinator.async_add_connection_listener(self.async_write_ha_state)
+        )
         self.async_write_ha_state()
 
+    @callback
+    def _async_handle_update(self) -> None:
+        """Take over the state reported by the plug."""
+        self._state = self._pca.get_state(self._device_id)
+        self._available = True
+        self.async_write_ha_state()
+
+    @callback
+    def _async_handle_report(self) -> None:
+        """Become available again when the plug reports after a failed command."""
+        if not self._available:
+            self._async_handle_update()
+
     @property
     def available(self) -> bool:
         """Return if switch is available (Home Assistant shows device as grey if False)."""
-        return self._available
+        return self._pca.available and self._available
 
     @property
     def is_on(self):
@@ -183,42 +203,31 @@ class SmartPlugSwitch(SwitchEntity):
 
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn the switch on."""
-        try:
-            _LOGGER.info(f"Turning on PCA301 device {self._device_id}")
-            async with self._pca_lock:
-                await self.hass.async_add_executor_job(self._pca.turn_on, self._device_id)
-            self._state = True
-            self._available = True
-            self.async_write_ha_state()
-            _LOGGER.info(f"PCA301 device {self._device_id} turned on successfully")
-        except Exception as ex:
-            _LOGGER.error(f"Could not turn on PCA301 device {self._device_id}: {ex}")
-            self._available = False
-            self.async_write_ha_state()
+        await self._async_switch(True)
 
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn the switch off."""
-        try:
-            _LOGGER.info(f"Turning off PCA301 device {self._device_id}")
-            async with self._pca_lock:
-                await self.hass.async_add_executor_job(self._pca.turn_off, self._device_id)
-            self._state = False
-            self._available = True
-            self.async_write_ha_state()
-            _LOGGER.info(f"PCA301 device {self._device_id} turned off successfully")
-        except Exception as ex:
-            _LOGGER.error(f"Could not turn off PCA301 device {self._device_id}: {ex}")
-            self._available = False
-            self.async_write_ha_state()
+        await self._async_switch(False)
 
-    async def async_update(self) -> None:
-        """Update the PCA switch's state."""
+    async def _async_switch(self, on: bool) -> None:
+        """Switch the plug, the state is only taken over once confirmed."""
+        action = "on" if on else "off"
         try:
-            async with self._pca_lock:
-                self._state = await self.hass.async_add_executor_job(self._pca.get_state, self._device_id)
-            self._available = True
+            _LOGGER.info(f"Turning {action} PCA301 device {self._device_id}")
+            if on:
+                await self._pca.async_turn_on(self._device_id)
+            else:
+                await self._pca.async_turn_off(self._device_id)
+        except pypca.PCACommandError as ex:
+            _LOGGER.error(f"Could not turn {action} PCA301 device {self._device_id}: {ex}")
+            # Show what the plug last reported instead of the requested state
+            self._state = self._pca.get_state(self._device_id)
+            self._available = False
             self.async_write_ha_state()
-        except OSError as ex:
-            if self._available:
-                _LOGGER.warning("Could not read state for %s: %s", self.name, ex)
-                self._available = False
+            raise HomeAssistantError(
+                f"PCA301 device {self._device_id} did not confirm turning {action}"
+            ) from ex
+        self._state = on
+        self._available = True
+        self.async_write_ha_state()
+        _LOGGER.info(f"PCA301 device {self._device_id} turned {action} successfully")
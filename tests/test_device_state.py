@@ -0,0 +1,56 @@
+"""Tests for the per-plug state records."""
+
+from types import SimpleNamespace
+
+from custom_components.pca301.device_state import (
+    CONSUMPTION,
+    POWER,
+    STATE,
+    DeviceState,
+    parse_channel,
+)
+
+
+def report(state=1, power=10.0, consumption=1.0, channel=3):
+    return SimpleNamespace(
+        state=state, power=power, consumption=consumption, channel=channel
+    )
+
+
+def test_parse_channel_decimal():
+    # Channel maps of older entries hold the decimal token of the frame
+    assert parse_channel("1") == 1
+    assert parse_channel("01") == 1
+    assert parse_channel("10") == 10
+    assert parse_channel("12") == 12
+
+
+def test_parse_channel_int_and_none():
+    assert parse_channel(10) == 10
+    assert parse_channel(None) is None
+
+
+def test_parse_channel_hex_fallback():
+    assert parse_channel("0a") == 10
+    assert parse_channel("C") == 12
+
+
+def test_update_returns_changed_values():
+    device = DeviceState()
+    assert device.update(report(), 1.0) == {STATE, POWER, CONSUMPTION}
+    assert device.update(report(), 2.0) == set()
+    assert device.update(report(power=12.0), 3.0) == {POWER}
+    assert device.update(report(state=0, power=0.0), 4.0) == {STATE, POWER}
+    assert device.last_updated == 4.0
+    assert device.channel == 3
+
+
+def test_snapshot_is_immutable_copy():
+    device = DeviceState(channel=5)
+    device.update(report(), 1.0)
+    device.version = 7
+    snapshot = device.snapshot()
+    device.update(report(power=99.0), 2.0)
+    assert snapshot.power == 10.0
+    assert snapshot.version == 7
+    assert snapshot._asdict()["channel"] == 3
@@ -0,0 +1,103 @@
+"""Tests for the filtering of report-driven state writes."""
+
+from types import SimpleNamespace
+
+from custom_components.pca301.const import (
+    CONF_HEARTBEAT,
+    CONF_MIN_INTERVAL,
+    CONF_POWER_DEADBAND,
+    CONF_POWER_DEADBAND_PERCENT,
+)
+from custom_components.pca301.device_state import CONSUMPTION, POWER, STATE, VALUES
+from custom_components.pca301.filters import WriteFilter
+
+
+def device(state=1, power=100.0, consumption=1.0):
+    return SimpleNamespace(state=state, power=power, consumption=consumption)
+
+
+def test_from_options_off():
+    assert WriteFilter.from_options({}) is None
+    assert WriteFilter.from_options({CONF_POWER_DEADBAND: 0, CONF_HEARTBEAT: 0}) is None
+
+
+def test_from_options_heartbeat_only():
+    write_filter = WriteFilter.from_options({CONF_HEARTBEAT: 300})
+    assert write_filter is not None
+    assert write_filter.heartbeat == 300.0
+
+
+def test_from_options_values():
+    write_filter = WriteFilter.from_options(
+        {
+            CONF_POWER_DEADBAND: "2",
+            CONF_POWER_DEADBAND_PERCENT: 5,
+            CONF_MIN_INTERVAL: 10,
+        }
+    )
+    assert (write_filter.deadband, write_filter.deadband_percent) == (2.0, 5.0)
+    assert write_filter.min_interval == 10.0
+
+
+def test_first_report_writes_everything():
+    assert WriteFilter(deadband=5).should_write("a", device(), 0) == VALUES
+
+
+def test_power_deadband():
+    write_filter = WriteFilter(deadband=5)
+    write_filter.should_write("a", device(power=100.0), 0)
+    assert write_filter.should_write("a", device(power=104.0), 1) == set()
+    assert write_filter.should_write("a", device(power=106.0), 2) == {POWER}
+    # The band is around the last written power, not the last report
+    assert write_filter.should_write("a", device(power=109.0), 3) == set()
+
+
+def test_power_deadband_percent():
+    write_filter = WriteFilter(deadband=1, deadband_percent=10)
+    write_filter.should_write("a", device(power=1000.0), 0)
+    assert write_filter.should_write("a", device(power=1090.0), 1) == set()
+    assert write_filter.should_write("a", device(power=1101.0), 2) == {POWER}
+
+
+def test_consumption_does_not_drag_power_along():
+    write_filter = WriteFilter(deadband=5, min_interval=10)
+    write_filter.should_write("a", device(power=2000.0, consumption=1.0), 0)
+    assert write_filter.should_write(
+        "a", device(power=2003.0, consumption=1.01), 1
+    ) == {CONSUMPTION}
+    # Outside the band, but within the minimum interval
+    assert write_filter.should_write(
+        "a", device(power=2100.0, consumption=1.02), 2
+    ) == {CONSUMPTION}
+    assert write_filter.should_write(
+        "a", device(power=2100.0, consumption=1.02), 10
+    ) == {POWER}
+
+
+def test_switching_writes_power_too():
+    write_filter = WriteFilter(deadband=5, min_interval=60)
+    write_filter.should_write("a", device(state=1, power=100.0), 0)
+    assert write_filter.should_write("a", device(state=0, power=0.0), 1) == {
+        STATE,
+        POWER,
+    }
+
+
+def test_heartbeat_writes_unchanged_power():
+    write_filter = WriteFilter(heartbeat=300)
+    write_filter.should_write("a", device(), 0)
+    assert write_filter.should_write("a", device(), 299) == set()
+    assert write_filter.should_write("a", device(), 300) == {POWER}
+    assert write_filter.should_write("a", device(), 301) == set()
+
+
+def test_heartbeat_only_passes_power_changes():
+    write_filter = WriteFilter(heartbeat=300)
+    write_filter.should_write("a", device(power=100.0), 0)
+    assert write_filter.should_write("a", device(power=100.1), 1) == {POWER}
+
+
+def test_devices_are_independent():
+    write_filter = WriteFilter(deadband=5)
+    write_filter.should_write("a", device(power=100.0), 0)
+    assert write_filter.should_write("b", device(power=101.0), 1) == VALUES
@@ -0,0 +1,161 @@
+"""Tests for the routing of commands across several sticks."""
+
+import asyncio
+import time
+
+import pytest
+
+from custom_components.pca301.hub import DUPLICATE_WINDOW, PCAHub
+from custom_components.pca301.protocol import decode_report
+from custom_components.pca301.pypca import PCACommandError
+
+DEVICE_ID = "001002003"
+REPORT = decode_report(b"OK 24 3 4 1 2 3 1 3 232 0 150")
+OTHER_REPORT = decode_report(b"OK 24 3 4 1 2 3 1 3 242 0 150")
+
+
+class FakeStick:
+    """The parts of a PCA the hub uses."""
+
+    def __init__(self, port, known_devices=None, fail=False):
+        self.port = port
+        self.known_devices = known_devices or {}
+        self.fail = fail
+        self.is_open = True
+        self.ready = True
+        self.command_deadline = 10.0
+        self.command_retries = 2
+        self.applied = []
+        self.calls = []
+        self._waiters = {}
+
+    def _apply_report(self, deviceId, report, now):
+        self.applied.append((deviceId, report, now))
+
+    def _resolve_waiters(self, deviceId, report):
+        self._waiters.pop(deviceId)
+
+    def get_snapshot(self, deviceId):
+        return None
+
+    async def _async_command(self, *args):
+        self.calls.append(args)
+        if self.fail:
+            raise PCACommandError("no answer")
+        return self.port
+
+    def async_switch(self, deviceId, value, channel=None, deadline=None):
+        return self._async_command("switch", value, channel, deadline)
+
+    def async_status_request(self, deviceId, timeout=None, retries=None, channel=None):
+        return self._async_command("status", timeout, retries, channel)
+
+
+def make_hub(*sticks):
+    hub = PCAHub()
+    for stick in sticks:
+        hub.add(stick)
+    return hub
+
+
+def test_report_heard_by_two_sticks_is_applied_once():
+    owner = FakeStick("/dev/a", {DEVICE_ID: 3})
+    other = FakeStick("/dev/b")
+    hub = make_hub(owner, other)
+    hub.heard(owner, DEVICE_ID, REPORT, 100.0)
+    hub.heard(other, DEVICE_ID, REPORT, 100.1)
+    assert len(owner.applied) == 1
+    assert other.applied == []
+    # Both sticks are known to reach the plug
+    assert set(hub.link_info(DEVICE_ID)) == {"/dev/a", "/dev/b"}
+    assert hub.link_info(DEVICE_ID)["/dev/b"]["last_heard"] == 100.1
+
+
+def test_new_values_or_later_repeats_are_applied():
+    owner = FakeStick("/dev/a", {DEVICE_ID: 3})
+    hub = make_hub(owner)
+    hub.heard(owner, DEVICE_ID, REPORT, 100.0)
+    hub.heard(owner, DEVICE_ID, OTHER_REPORT, 100.2)
+    hub.heard(owner, DEVICE_ID, OTHER_REPORT, 100.2 + DUPLICATE_WINDOW)
+    assert len(owner.applied) == 3
+
+
+def test_report_resolves_waiters_of_other_sticks():
+    owner = FakeStick("/dev/a", {DEVICE_ID: 3})
+    sender = FakeStick("/dev/b")
+    sender._waiters[DEVICE_ID] = []
+    hub = make_hub(owner, sender)
+    hub.heard(owner, DEVICE_ID, REPORT, 100.0)
+    assert DEVICE_ID not in sender._waiters
+
+
+def test_unknown_device_is_applied_by_the_hearing_stick():
+    first = FakeStick("/dev/a")
+    second = FakeStick("/dev/b")
+    hub = make_hub(first, second)
+    hub.heard(second, DEVICE_ID, REPORT, 100.0)
+    assert first.applied == []
+    assert len(second.applied) == 1
+
+
+def test_failover_splits_the_deadline():
+    first = FakeStick("/dev/a", {DEVICE_ID: 3}, fail=True)
+    second = FakeStick("/dev/b")
+    hub = make_hub(first, second)
+    now = time.time()
+    hub.heard(first, DEVICE_ID, REPORT, now)
+    hub.heard(second, DEVICE_ID, REPORT, now)
+    assert hub.routes(DEVICE_ID) == [first, second]
+    assert asyncio.run(hub.async_switch(DEVICE_ID, 1)) == "/dev/b"
+    assert first.calls == [("switch", 1, 3, 5.0)]
+    assert second.calls == [("switch", 1, 3, 5.0)]
+    assert hub.link_info(DEVICE_ID)["/dev/a"]["reliability"] < 1.0
+    # The failing stick is tried last from now on
+    assert hub.routes(DEVICE_ID) == [second, first]
+
+
+def test_single_stick_gets_the_full_deadline():
+    stick = FakeStick("/dev/a", {DEVICE_ID: 3})
+    hub = make_hub(stick)
+    asyncio.run(hub.async_switch(DEVICE_ID, 0))
+    assert stick.calls == [("switch", 0, 3, 10.0)]
+
+
+def test_status_request_splits_the_tries():
+    first = FakeStick("/dev/a", {DEVICE_ID: 3}, fail=True)
+    second = FakeStick("/dev/b")
+    hub = make_hub(first, second)
+    asyncio.run(hub.async_status_request(DEVICE_ID))
+    # 3 tries of one stick, split over two: 2 tries (1 retry) each
+    assert first.calls == [("status", None, 1, 3)]
+    assert second.calls == [("status", None, 1, 3)]
+
+
+def test_closed_stick_is_skipped_and_not_blamed():
+    closed = FakeStick("/dev/a", {DEVICE_ID: 3})
+    closed.is_open = False
+    working = FakeStick("/dev/b")
+    hub = make_hub(closed, working)
+    assert asyncio.run(hub.async_switch(DEVICE_ID, 1)) == "/dev/b"
+    assert closed.calls == []
+    assert working.calls == [("switch", 1, 3, 10.0)]
+    assert "/dev/a" not in hub.link_info(DEVICE_ID)
+
+
+def test_error_when_all_sticks_fail():
+    hub = make_hub(
+        FakeStick("/dev/a", {DEVICE_ID: 3}, fail=True), FakeStick("/dev/b", fail=True)
+    )
+    with pytest.raises(PCACommandError):
+        asyncio.run(hub.async_switch(DEVICE_ID, 1))
+
+
+def test_error_without_open_stick():
+    stick = FakeStick("/dev/a", {DEVICE_ID: 3})
+    stick.is_open = False
+    with pytest.raises(PCACommandError):
+        asyncio.run(make_hub(stick).async_switch(DEVICE_ID, 1))
+
+
+def test_channel_of_unscanned_device_defaults_to_one():
+    assert make_hub(FakeStick("/dev/a")).channel(DEVICE_ID) == 1
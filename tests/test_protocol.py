@@ -0,0 +1,92 @@
+"""Tests for the pcaSerial frame codec."""
+
+from custom_components.pca301.protocol import (
+    CMD_MEASURE,
+    CMD_SWITCH,
+    NO_MEASUREMENT,
+    FrameSplitter,
+    decode_report,
+    encode_command,
+    format_device_id,
+    parse_device_id,
+)
+
+REPORT = b"OK 24 3 4 1 2 3 1 3 232 0 150"
+
+
+def test_decode_report():
+    report = decode_report(REPORT)
+    assert report.device == 1 << 16 | 2 << 8 | 3
+    assert (report.channel, report.command, report.state) == (3, CMD_MEASURE, 1)
+    assert report.power == 100.0
+    assert report.consumption == 1.5
+    assert report.raw_power == 1000
+
+
+def test_decode_report_no_measurement():
+    report = decode_report(b"OK 24 3 4 1 2 3 1 170 170 170 170")
+    assert report.raw_power == NO_MEASUREMENT
+
+
+def test_decode_report_rejects_other_lines():
+    assert decode_report(b"[pcaSerial.1.0]") is None
+    assert decode_report(b"OK 23 3 4 1 2 3 1 3 232 0 150") is None
+    assert decode_report(b"OK 24 3 4 1 2 3 1 3 232 0") is None
+    assert decode_report(b"OK 24 3 4 1 2 3 1 3 x 0 150") is None
+
+
+def test_encode_command():
+    device = parse_device_id("001002003")
+    assert encode_command(10, CMD_SWITCH, device, 1) == b"10,5,1,2,3,1,255,255,255,255s"
+    assert encode_command(3, CMD_MEASURE, device) == b"3,4,1,2,3,0,255,255,255,255s"
+
+
+def test_device_id_round_trip():
+    assert format_device_id(parse_device_id("009088163")) == "009088163"
+    assert parse_device_id("255255255") == 0xFFFFFF
+
+
+def test_splitter_lines_across_chunks():
+    splitter = FrameSplitter()
+    assert splitter.feed(b"OK 24 3 4 1 2 3 1 3 2") == []
+    assert splitter.feed(b"32 0 150\r\nOK 24") == [REPORT]
+    assert splitter.feed(b" 3 4 1 2 3 1 3 232 0 150\n") == [REPORT]
+    assert splitter.dropped_bytes == 0
+
+
+def test_splitter_keeps_other_lines():
+    splitter = FrameSplitter()
+    assert splitter.feed(b"\r\n[pcaSerial.1.0]\r\n") == [b"[pcaSerial.1.0]"]
+    assert splitter.dropped_bytes == 0
+
+
+def test_splitter_drops_garbage_before_report():
+    splitter = FrameSplitter()
+    assert splitter.feed(b"\x00\xffxy" + REPORT + b"\r\n") == [REPORT]
+    assert splitter.dropped_bytes == 4
+
+
+def test_splitter_resyncs_on_truncated_report():
+    # A report cut off by the next one: only the complete one is kept
+    truncated = b"OK 24 3 4 1 2"
+    splitter = FrameSplitter()
+    assert splitter.feed(truncated + REPORT + b"\n") == [REPORT]
+    assert splitter.dropped_bytes == len(truncated)
+
+
+def test_splitter_limits_pending_bytes():
+    splitter = FrameSplitter(max_pending=32)
+    assert splitter.feed(b"x" * 40) == []
+    assert splitter.dropped_bytes == 40
+    # Without line end, the data from the last report token on is kept
+    assert splitter.feed(b"y" * 30 + b"OK 24 3 4") == []
+    assert splitter.dropped_bytes == 70
+    assert splitter.feed(b" 1 2 3 1 3 232 0 150\n") == [b"OK 24 3 4 1 2 3 1 3 232 0 150"]
+
+
+def test_splitter_clear_counts_pending():
+    splitter = FrameSplitter()
+    splitter.feed(b"OK 24 3")
+    splitter.clear()
+    assert splitter.dropped_bytes == 7
+    assert splitter.feed(REPORT + b"\n") == [REPORT]
@@ -0,0 +1,67 @@
+"""Tests for the report handling of the PCA class."""
+
+import asyncio
+from unittest.mock import MagicMock
+
+from custom_components.pca301.pypca import PCA
+
+DEVICE_ID = "001002003"
+REPORT = b"OK 24 3 4 1 2 3 1 3 232 0 150"  # on, 100.0 W, 1.5 kWh
+# Same plug, power and consumption bytes 0xAAAA: not a measurement
+NO_MEASUREMENT = b"OK 24 3 4 1 2 3 1 170 170 170 170"
+
+
+def make_pca():
+    pca = PCA(MagicMock(), "/dev/null", status_polling=False)
+    pca.known_devices = {DEVICE_ID: 3}
+    pca.state_store = MagicMock()
+    pca.rolling = MagicMock()
+    return pca
+
+
+def test_report_is_applied():
+    pca = make_pca()
+    pca._handle_line(REPORT)
+    snapshot = pca.get_snapshot(DEVICE_ID)
+    assert (snapshot.state, snapshot.power, snapshot.consumption) == (1, 100.0, 1.5)
+    pca.state_store.async_schedule_save.assert_called_once()
+    pca.rolling.add.assert_called_once()
+
+
+def test_no_measurement_frame_is_ignored():
+    pca = make_pca()
+    pca._handle_line(REPORT)
+    snapshot = pca.get_snapshot(DEVICE_ID)
+    pca.state_store.reset_mock()
+    pca.rolling.reset_mock()
+
+    pca._handle_line(NO_MEASUREMENT)
+
+    assert pca.get_snapshot(DEVICE_ID) is snapshot
+    assert pca.version == snapshot.version
+    pca.state_store.async_schedule_save.assert_not_called()
+    pca.rolling.add.assert_not_called()
+    assert pca.stats.frames_parsed == 2
+
+
+def test_no_measurement_frame_does_not_answer_commands():
+    loop = asyncio.new_event_loop()
+    try:
+        pca = make_pca()
+        future = loop.create_future()
+        pca._waiters[DEVICE_ID] = [(future, None)]
+        pca._handle_line(NO_MEASUREMENT)
+        assert not future.done()
+        pca._handle_line(REPORT)
+        assert future.result().power == 100.0
+    finally:
+        loop.close()
+
+
+def test_no_measurement_frame_is_not_scanned():
+    pca = make_pca()
+    pca.known_devices = {}
+    pca._scan_ids = []
+    pca._handle_line(NO_MEASUREMENT)
+    assert pca._scan_ids == []
+    assert pca.get_snapshot(DEVICE_ID) is None
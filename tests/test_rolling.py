@@ -0,0 +1,110 @@
+"""Tests for the rolling power statistics."""
+
+import random
+
+import pytest
+
+from custom_components.pca301.rolling import RollingStats, RollingWindow
+
+
+def test_empty_window():
+    rolling = RollingWindow(60)
+    assert len(rolling) == 0
+    assert rolling.mean is None
+    assert rolling.minimum is None
+    assert rolling.maximum is None
+    assert rolling.time_weighted_mean(0.0) is None
+
+
+def test_keeps_the_sample_in_effect_at_the_window_start():
+    rolling = RollingWindow(60)
+    for when, value in ((0, 10.0), (30, 20.0), (70, 30.0)):
+        rolling.add(when, value)
+    # The sample of t=0 only ended at t=30, inside the window of t=70
+    assert len(rolling) == 3
+    rolling.add(100, 40.0)
+    # Window starts at 40: the sample of t=30 is in effect there, t=0 is gone
+    assert len(rolling) == 3
+    assert rolling.minimum == 20.0
+    assert rolling.maximum == 40.0
+    assert rolling.mean == 30.0
+
+
+def test_expire_without_new_samples():
+    rolling = RollingWindow(60)
+    rolling.add(0, 10.0)
+    rolling.add(10, 50.0)
+    rolling.expire(200)
+    # The last sample stays, it is still in effect
+    assert len(rolling) == 1
+    assert rolling.maximum == rolling.minimum == 50.0
+
+
+def test_ring_size_evicts_oldest():
+    rolling = RollingWindow(3600, size=4)
+    for when, value in enumerate((100.0, 1.0, 2.0, 3.0, 4.0)):
+        rolling.add(when, value)
+    assert len(rolling) == 4
+    assert rolling.maximum == 4.0
+    assert rolling.minimum == 1.0
+    assert rolling.mean == 2.5
+
+
+def test_time_weighted_mean():
+    rolling = RollingWindow(60)
+    rolling.add(0, 0.0)
+    rolling.add(30, 100.0)
+    # 30 s at 0 W and 30 s at 100 W
+    assert rolling.time_weighted_mean(60) == pytest.approx(50.0)
+    # Window 40..100: 60 s at 100 W, the 0 W sample is out of it
+    assert rolling.time_weighted_mean(100) == pytest.approx(100.0)
+
+
+def brute_force(samples, window, now):
+    start = now - window
+    kept = [sample for sample in samples if sample[0] > start]
+    older = [sample for sample in samples if sample[0] <= start]
+    if older:
+        kept.insert(0, older[-1])
+    values = [value for _, value in kept]
+    area = 0.0
+    for (when, value), (following, _) in zip(kept, kept[1:] + [(now, None)]):
+        area += value * (following - max(when, start))
+    duration = now - max(start, kept[0][0])
+    weighted = area / duration if duration > 0 else values[-1]
+    return min(values), max(values), sum(values) / len(values), weighted
+
+
+def test_matches_brute_force():
+    rnd = random.Random(301)
+    rolling = RollingWindow(120, size=64)
+    samples = []
+    when = 0.0
+    gap = rnd.expovariate(1 / 5)
+    for _ in range(2000):
+        when += gap
+        gap = rnd.expovariate(1 / 5)
+        # float32 storage, compare against the stored values
+        value = float(rnd.choice((0, 2.5, 60, 800)) + rnd.randint(0, 10))
+        rolling.add(when, value)
+        samples.append((when, value))
+        samples = samples[-64:]
+        minimum, maximum, mean, _ = brute_force(samples, 120, when)
+        assert rolling.minimum == minimum
+        assert rolling.maximum == maximum
+        assert rolling.mean == pytest.approx(mean)
+        # Reading the average expires what fell out of the window by then,
+        # so read it before the next sample arrives
+        now = when + rnd.uniform(0, gap)
+        weighted = brute_force(samples, 120, now)[3]
+        assert rolling.time_weighted_mean(now) == pytest.approx(weighted)
+
+
+def test_rolling_stats_per_device():
+    stats = RollingStats((60, 900))
+    assert stats.get("a", 60) is None
+    stats.add("a", 0, 10.0)
+    stats.add("b", 0, 20.0)
+    assert stats.get("a", 60).maximum == 10.0
+    assert stats.get("a", 900).maximum == 10.0
+    assert stats.get("b", 60).maximum == 20.0